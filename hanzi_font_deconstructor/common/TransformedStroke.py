@@ -1,5 +1,8 @@
 from dataclasses import dataclass
 from typing import Tuple
+import numpy as np
+from .affine import apply_matrix, get_stroke_matrices
+from .stroke_library import compile_stroke
 
 
 @dataclass
@@ -10,3 +13,13 @@ class TransformedStroke:
     skewY: float
     scale: Tuple[float, float]
     path: str
+
+    def matrix(self) -> np.ndarray:
+        "the 3x3 affine matrix for this stroke's transform, in viewbox units"
+        return get_stroke_matrices(
+            self.translate, self.rotate, self.skewX, self.skewY, self.scale
+        )[0]
+
+    def polygon(self) -> np.ndarray:
+        "the flattened outline of the stroke with its transform applied, as an (N, 2) array"
+        return apply_matrix(self.matrix(), compile_stroke(self.path).polygon)
@@ -0,0 +1,79 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+
+# All matrices here are 3x3 homogeneous affine matrices acting on column vectors (x, y, 1),
+# so they compose the same way an svg transform list does: "A B" is A @ B
+
+
+def get_stroke_matrices(translates, rotates, skewXs, skewYs, scales) -> np.ndarray:
+    """
+    Build the (N, 3, 3) matrices for N strokes, equivalent to the svg transform
+    "translate(tx, ty) rotate(r) skewX(kx) skewY(ky) scale(sx, sy)", with angles in degrees
+    """
+    translates = np.asarray(translates, dtype=np.float64).reshape(-1, 2)
+    scales = np.asarray(scales, dtype=np.float64).reshape(-1, 2)
+    rotates = np.radians(np.asarray(rotates, dtype=np.float64).reshape(-1))
+    tan_x = np.tan(np.radians(np.asarray(skewXs, dtype=np.float64).reshape(-1)))
+    tan_y = np.tan(np.radians(np.asarray(skewYs, dtype=np.float64).reshape(-1)))
+    cos = np.cos(rotates)
+    sin = np.sin(rotates)
+    # rotate @ skewX @ skewY, multiplied out
+    a = cos * (1 + tan_x * tan_y) - sin * tan_y
+    b = cos * tan_x - sin
+    c = sin * (1 + tan_x * tan_y) + cos * tan_y
+    d = sin * tan_x + cos
+    matrices = np.zeros((len(translates), 3, 3))
+    matrices[:, 0, 0] = a * scales[:, 0]
+    matrices[:, 0, 1] = b * scales[:, 1]
+    matrices[:, 1, 0] = c * scales[:, 0]
+    matrices[:, 1, 1] = d * scales[:, 1]
+    matrices[:, :2, 2] = translates
+    matrices[:, 2, 2] = 1
+    return matrices
+
+
+def get_viewbox_matrix(
+    viewbox: Tuple[int, int, int, int], width: int, height: int
+) -> np.ndarray:
+    """
+    Map the viewbox onto a width x height image, centered and preserving the aspect ratio,
+    the same way cairosvg does for the default preserveAspectRatio="xMidYMid"
+    """
+    vbMinX, vbMinY, vbWidth, vbHeight = viewbox
+    scale = min(width / vbWidth, height / vbHeight)
+    return np.array(
+        [
+            [scale, 0, (width - scale * vbWidth) / 2 - scale * vbMinX],
+            [0, scale, (height - scale * vbHeight) / 2 - scale * vbMinY],
+            [0, 0, 1],
+        ]
+    )
+
+
+def apply_matrix(matrix: np.ndarray, points: np.ndarray) -> np.ndarray:
+    "apply a single 3x3 matrix to an (N, 2) array of points"
+    return points @ matrix[:2, :2].T + matrix[:2, 2]
+
+
+def transform_polygons(
+    matrices: np.ndarray, polygons: Sequence[np.ndarray]
+) -> List[np.ndarray]:
+    """
+    Apply matrices[i] to polygons[i] for every polygon at once.
+    The polygons can have different numbers of points, so they're transformed as one flat array of points
+    """
+    lengths = [len(polygon) for polygon in polygons]
+    points = np.concatenate(polygons)
+    point_matrices = np.repeat(np.asarray(matrices), lengths, axis=0)
+    transformed = (
+        np.einsum("nij,nj->ni", point_matrices[:, :2, :2], points)
+        + point_matrices[:, :2, 2]
+    )
+    return np.split(transformed, np.cumsum(lengths)[:-1])
+
+
+def get_polygon_bounds(polygon: np.ndarray) -> Tuple[float, float, float, float]:
+    "return a tuple of (min_x, max_x, min_y, max_y)"
+    min_x, min_y = polygon.min(0)
+    max_x, max_y = polygon.max(0)
+    return (min_x, max_x, min_y, max_y)
@@ -0,0 +1,42 @@
+from typing import Dict, List
+import torch
+from .shards import image_to_uint8
+
+# Samples travel from DataLoader workers to the training loop as uint8 tensors, a quarter of the size
+# of float32 images and an eighth of int64 masks, and are only converted once they're on the device
+
+
+def uint8_sample(input: torch.Tensor, mask: torch.Tensor) -> Dict[str, torch.Tensor]:
+    "convert a (1, H, W) float input and (H, W) mask, as returned by generate_sample, for transport"
+    return {
+        "image": torch.from_numpy(image_to_uint8(input)).unsqueeze(0),
+        "mask": mask.to(torch.uint8),
+    }
+
+
+def collate_uint8(samples: List[Dict]) -> Dict[str, torch.Tensor]:
+    """
+    DataLoader collate_fn stacking each field of the samples straight into one tensor.
+    In a worker process the batch is allocated in shared memory, so it isn't copied again on its way to the trainer
+    """
+    in_worker = torch.utils.data.get_worker_info() is not None
+    batch = {}
+    for key, first in samples[0].items():
+        if not isinstance(first, torch.Tensor):
+            batch[key] = torch.tensor([sample[key] for sample in samples])
+            continue
+        out = torch.empty((len(samples), *first.shape), dtype=first.dtype)
+        if in_worker:
+            out.share_memory_()
+        batch[key] = torch.stack([sample[key] for sample in samples], out=out)
+    return batch
+
+
+def images_to_device(imgs: torch.Tensor, device) -> torch.Tensor:
+    "move a batch of uint8 images to the device, converting them to floats between 0 and 1 there"
+    return imgs.to(device=device, non_blocking=True).to(torch.float32) / 255
+
+
+def masks_to_device(masks: torch.Tensor, device, dtype=torch.long) -> torch.Tensor:
+    "move a batch of uint8 masks to the device, converting them to the loss's dtype there"
+    return masks.to(device=device, non_blocking=True).to(dtype)
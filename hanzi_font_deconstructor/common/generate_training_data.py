@@ -1,19 +1,25 @@
-from dataclasses import replace
+from dataclasses import dataclass, replace
 from hanzi_font_deconstructor.common.TransformedStroke import TransformedStroke
 from .generate_svg import generate_svg, get_stroke_attrs
-from .transform_stroke import transform_stroke
-from .transform_stroke import transform_stroke
-from .svg_to_pil import svg_to_pil
+from .transform_stroke import transform_stroke, get_transformed_polygons
+from .affine import get_polygon_bounds, get_viewbox_matrix
+from .occupancy import get_occupancy, is_obviously_bad
+from .stroke_library import StrokeLibrary, compile_stroke
+from .glyph_pack import load_glyph_pack, read_glyph_svg_path
+from .instrumentation import count, stage, timed_stage
+from functools import lru_cache
 from os import path
 from pathlib import Path
+from typing import List, Optional
 import random
-import re
+import numpy as np
 import torch
-from torchvision import transforms
 
 
 PROJECT_ROOT = Path(__file__).parents[2]
 GLYPH_SVGS_DIR = PROJECT_ROOT / "noto_glyphs"
+# built from GLYPH_SVGS_DIR by scripts/pack_glyphs.py, used instead of the svgs if it exists
+GLYPH_PACK_FILE = PROJECT_ROOT / "noto_glyphs.pack"
 
 MASK_THRESHOLD = 0.3
 
@@ -93,6 +99,14 @@ STROKE_VIEW_BOX = (-10, 0, 1010, 1000)
 VIEW_BOX_WIDTH = STROKE_VIEW_BOX[2]
 VIEW_BOX_HEIGHT = STROKE_VIEW_BOX[3]
 
+# candidate strokes are checked on a coarse grid before they're rendered at full size,
+# and thrown away if they overlap an existing stroke by much more than is_stroke_good allows
+OCCUPANCY_GRID_SIZE = 64
+OCCUPANCY_GRID_MATRIX = get_viewbox_matrix(
+    STROKE_VIEW_BOX, OCCUPANCY_GRID_SIZE, OCCUPANCY_GRID_SIZE
+)
+PREFILTER_OVERLAP_RATIO = 0.35
+
 MISC_SINGLE_STROKE_PATHS = [
     "M884 65l34 62c-131 40 -349 62 -523 72c-2 -18 -10 -44 -18 -61c173 -12 387 -36 507 -73z",
     "M542 409 l-60 26c-14 -47 -46 -122 -74 -178l57 -22c30 56 63 127 77 174z",
@@ -109,44 +123,83 @@ def get_file_for_char(char):
     return path.join(GLYPH_SVGS_DIR, f"{code}.svg")
 
 
-path_extractor = re.compile(r'\bd="([^"]+)"')
-
-
 def path_for_char(char):
-    char_file = get_file_for_char(char)
-    with open(char_file, "r") as contents:
-        char_svg = contents.read().replace("\n", "")
-    path_match = path_extractor.search(char_svg)
-    if not path_match:
+    glyph_pack = load_glyph_pack(GLYPH_PACK_FILE)
+    if glyph_pack is not None:
+        char_path = glyph_pack.get_path(char)
+    else:
+        char_path = read_glyph_svg_path(get_file_for_char(char))
+    if char_path is None:
         raise Exception(f"No SVG path found in char svg: {char}")
-    return path_match[1]
+    return char_path
+
 
+@dataclass
+class StrokeTables:
+    single_stroke_char_paths: List[str]
+    boxy_stroke_char_paths: List[str]
+    horiz_stroke_char_paths: List[str]
+    vert_stroke_char_paths: List[str]
+    single_stroke_paths: List[str]
+    single_strokes: StrokeLibrary
+    boxy_strokes: StrokeLibrary
+    horiz_strokes: StrokeLibrary
+    vert_strokes: StrokeLibrary
 
-SINGLE_STROKE_CHAR_PATHS = [path_for_char(char) for char in SINGLE_STROKE_CHARS]
-BOXY_STROKE_CHAR_PATHS = [path_for_char(char) for char in BOXY_STROKE_CHARS]
-HORIZ_STROKE_CHAR_PATHS = [path_for_char(char) for char in HORIZ_STROKE_CHARS]
-VERT_STROKE_CHAR_PATHS = [path_for_char(char) for char in VERT_STROKE_CHARS]
+
+@lru_cache(maxsize=None)
+def get_stroke_tables() -> StrokeTables:
+    """
+    The stroke paths and libraries that training data is generated from.
+    They're built the first time they're needed rather than on import, so importing this module
+    doesn't read any glyphs
+    """
+    single_stroke_char_paths = [path_for_char(char) for char in SINGLE_STROKE_CHARS]
+    boxy_stroke_char_paths = [path_for_char(char) for char in BOXY_STROKE_CHARS]
+    horiz_stroke_char_paths = [path_for_char(char) for char in HORIZ_STROKE_CHARS]
+    vert_stroke_char_paths = [path_for_char(char) for char in VERT_STROKE_CHARS]
+    single_stroke_paths = MISC_SINGLE_STROKE_PATHS + single_stroke_char_paths
+    return StrokeTables(
+        single_stroke_char_paths=single_stroke_char_paths,
+        boxy_stroke_char_paths=boxy_stroke_char_paths,
+        horiz_stroke_char_paths=horiz_stroke_char_paths,
+        vert_stroke_char_paths=vert_stroke_char_paths,
+        single_stroke_paths=single_stroke_paths,
+        single_strokes=StrokeLibrary(single_stroke_paths),
+        boxy_strokes=StrokeLibrary(boxy_stroke_char_paths),
+        horiz_strokes=StrokeLibrary(horiz_stroke_char_paths),
+        vert_strokes=StrokeLibrary(vert_stroke_char_paths),
+    )
 
 
-SINGLE_STROKE_PATHS = MISC_SINGLE_STROKE_PATHS + SINGLE_STROKE_CHAR_PATHS
+LAZY_STROKE_TABLES = {
+    "SINGLE_STROKE_CHAR_PATHS",
+    "BOXY_STROKE_CHAR_PATHS",
+    "HORIZ_STROKE_CHAR_PATHS",
+    "VERT_STROKE_CHAR_PATHS",
+    "SINGLE_STROKE_PATHS",
+    "SINGLE_STROKES",
+    "BOXY_STROKES",
+    "HORIZ_STROKES",
+    "VERT_STROKES",
+}
 
 
-tensorify = transforms.ToTensor()
+def __getattr__(name):
+    # keeps SINGLE_STROKES etc. importable from this module, building them on first access
+    if name in LAZY_STROKE_TABLES:
+        return getattr(get_stroke_tables(), name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def img_to_greyscale_tensor(img):
-    return tensorify(img)[3, :, :]
+    alpha = np.asarray(img.getchannel("A"), dtype=np.float32)
+    return torch.from_numpy(alpha) / 255
 
 
 def get_mask_bounds(mask):
     "return a tuple of (min_x, max_x, min_y, max_y)"
-    horiz_max_vals = torch.max(mask, 0).values
-    vert_max_vals = torch.max(mask, 1).values
-    min_x = torch.argmax(horiz_max_vals).item()
-    max_x = len(horiz_max_vals) - torch.argmax(torch.flip(horiz_max_vals, [0])).item()
-    min_y = torch.argmax(vert_max_vals).item()
-    max_y = len(vert_max_vals) - torch.argmax(torch.flip(vert_max_vals, [0])).item()
-    return (min_x, max_x, min_y, max_y)
+    return tuple(get_masks_bounds(mask.unsqueeze(0))[0].tolist())
 
 
 def get_mask_span(mask):
@@ -155,104 +208,255 @@ def get_mask_span(mask):
     return (max_x - min_x, max_y - min_y)
 
 
-def is_stroke_good(mask, existing_masks) -> bool:
-    # if this is the first stroke, then anything is fine
-    if len(existing_masks) == 0:
-        return True
-
-    # TODO: this is probably really slow, might need to speed this up somehow
-    mask_size = torch.sum(mask).item()
-    mask_span = get_mask_span(mask)
-    for existing_mask in existing_masks:
-        existing_mask_size = torch.sum(existing_mask).item()
-        overlaps = torch.where(existing_mask + mask >= 2, 1, 0)
-        overlaps_size = torch.sum(overlaps).item()
-        if overlaps_size == 0:
+def get_masks_bounds(masks):
+    "batched version of get_mask_bounds, return a (N, 4) tensor of (min_x, max_x, min_y, max_y) for a stack of masks"
+    # argmax doesn't take bool masks
+    horiz_max_vals = torch.amax(masks, 1).to(torch.uint8)
+    vert_max_vals = torch.amax(masks, 2).to(torch.uint8)
+    min_x = torch.argmax(horiz_max_vals, 1)
+    max_x = horiz_max_vals.shape[1] - torch.argmax(torch.flip(horiz_max_vals, [1]), 1)
+    min_y = torch.argmax(vert_max_vals, 1)
+    max_y = vert_max_vals.shape[1] - torch.argmax(torch.flip(vert_max_vals, [1]), 1)
+    return torch.stack([min_x, max_x, min_y, max_y], 1)
+
+
+def get_masks_max_span(masks):
+    "return the larger of the horizontal and vertical span for each mask in a stack of masks"
+    bounds = get_masks_bounds(masks)
+    return torch.maximum(bounds[:, 1] - bounds[:, 0], bounds[:, 3] - bounds[:, 2])
+
+
+class StrokeMaskStack:
+    """
+    The accepted stroke masks for a single training sample, stacked into one tensor.
+    The size and span of each mask is cached when it's added, so checking a new candidate
+    stroke against every existing mask is a single vectorized pass.
+    Masks are bool, as returned by alpha_to_mask
+    """
+
+    def __init__(self, masks=()):
+        self.masks = None
+        self.sizes = None
+        self.max_spans = None
+        for mask in masks:
+            self.add(mask)
+
+    def __len__(self):
+        return 0 if self.masks is None else self.masks.shape[0]
+
+    def __iter__(self):
+        return iter(self.masks if self.masks is not None else [])
+
+    def add(self, mask):
+        masks = mask.unsqueeze(0)
+        sizes = torch.sum(masks, (1, 2))
+        max_spans = get_masks_max_span(masks)
+        if self.masks is None:
+            self.masks, self.sizes, self.max_spans = masks, sizes, max_spans
+        else:
+            self.masks = torch.cat([self.masks, masks])
+            self.sizes = torch.cat([self.sizes, sizes])
+            self.max_spans = torch.cat([self.max_spans, max_spans])
+
+    def is_stroke_good(self, mask) -> bool:
+        # if this is the first stroke, then anything is fine
+        if len(self) == 0:
             return True
-            # # if this is the second stroke, ensure there's an overlap
-            # # we should ensure there's at least 1 overlap per training sample
-            # return len(existing_masks) > 1
-        # if the overlap is a large amount of either stroke, this is a bad stroke
-        if overlaps_size / existing_mask_size > 0.25:
-            return False
-        if overlaps_size / mask_size > 0.25:
-            return False
-        overlaps_span = get_mask_span(overlaps)
-        existing_mask_span = get_mask_span(existing_mask)
-        # if the overlap is a large amount of the span of either stroke, this is a bad stroke
-        if max(overlaps_span) / max(existing_mask_span) > 0.4:
-            return False
-        if max(overlaps_span) / max(mask_span) > 0.4:
-            return False
-    return True
+
+        overlaps = self.masks & mask.unsqueeze(0)
+        overlaps_sizes = torch.sum(overlaps, (1, 2))
+        mask_size = torch.sum(mask)
+        mask_max_span = get_masks_max_span(mask.unsqueeze(0))[0]
+        overlaps_max_spans = get_masks_max_span(overlaps)
+        # if the overlap is a large amount of either stroke, or a large amount of the span
+        # of either stroke, this is a bad stroke
+        is_bad = (
+            (overlaps_sizes / self.sizes > 0.25)
+            | (overlaps_sizes / mask_size > 0.25)
+            | (overlaps_max_spans / self.max_spans > 0.4)
+            | (overlaps_max_spans / mask_max_span > 0.4)
+        )
+        is_clear = overlaps_sizes == 0
+        # existing masks are checked in order, and the first mask that either doesn't
+        # overlap at all or overlaps badly decides the result
+        decisive = torch.nonzero(is_clear | is_bad)
+        if len(decisive) == 0:
+            return True
+        return bool(is_clear[decisive[0, 0]])
+
+
+def is_stroke_good(mask, existing_masks) -> bool:
+    if not isinstance(existing_masks, StrokeMaskStack):
+        existing_masks = StrokeMaskStack(existing_masks)
+    return existing_masks.is_stroke_good(mask)
+
+
+@timed_stage("render")
+def render_stroke_alpha(transformed_stroke, size_px):
+    "render a single stroke, returning its alpha channel as a tensor between 0 and 1"
+    # cairo is only loaded once something needs rendering
+    from .stroke_rasterizer import get_stroke_rasterizer
+
+    count("render_calls")
+    rasterizer = get_stroke_rasterizer(size_px, STROKE_VIEW_BOX)
+    # the rendered view is reused by the next render, so this conversion also copies it
+    return rasterizer.render_tensor(transformed_stroke).float() / 255
+
+
+def get_alpha_and_attrs(transformed_stroke, size_px):
+    stroke_alpha = render_stroke_alpha(transformed_stroke, size_px)
+    return (stroke_alpha, get_stroke_attrs(transformed_stroke))
+
+
+@timed_stage("mask")
+def alpha_to_mask(stroke_alpha):
+    "return a bool mask of the pixels the stroke covers"
+    return stroke_alpha > MASK_THRESHOLD
 
 
 def get_mask_and_attrs(transformed_stroke, size_px):
-    stroke_attrs = get_stroke_attrs(transformed_stroke)
-    stroke_svg = generate_svg([stroke_attrs], STROKE_VIEW_BOX)
-    stroke_img = svg_to_pil(stroke_svg, size_px, size_px)
-    stroke_tensor = img_to_greyscale_tensor(stroke_img)
-    stroke_mask = torch.where(stroke_tensor > MASK_THRESHOLD, 1, 0)
-    return (stroke_mask, stroke_attrs)
+    stroke_alpha, stroke_attrs = get_alpha_and_attrs(transformed_stroke, size_px)
+    return (alpha_to_mask(stroke_alpha), stroke_attrs)
 
 
-def get_training_input_svg_and_masks(size_px):
+def get_labels(stroke_masks):
     """
-    Create a single training example
+    Build (H, W) uint8 labels from a sample's stacked (S, H, W) bool stroke masks: 0 for background,
+    1 for a single stroke, and 2 wherever strokes overlap. Labels stay uint8 until they reach the loss
     """
-    num_strokes = random.randint(3, 4)
-    with torch.no_grad():
-        strokes_attrs = []
-        stroke_masks = []
-        # for 5% of training examples, make sure there's a boxy shape involved
-        if random.random() <= 0.05:
-            strokes_attrs, stroke_masks = create_boxy_strokes(size_px)
+    return torch.clamp(stroke_masks.sum(-3, dtype=torch.uint8), max=2)
 
-        while len(strokes_attrs) < num_strokes:
-            pathstr = random.choice(SINGLE_STROKE_PATHS)
-            stroke = transform_stroke(pathstr, STROKE_VIEW_BOX)
-            stroke_mask, stroke_attrs = get_mask_and_attrs(stroke, size_px)
 
-            if is_stroke_good(stroke_mask, stroke_masks):
-                strokes_attrs.append(stroke_attrs)
-                stroke_masks.append(stroke_mask)
-        input_svg = generate_svg(strokes_attrs, STROKE_VIEW_BOX)
-    return (input_svg, stroke_masks)
+@timed_stage("composite")
+def composite_alphas(stroke_alphas):
+    """
+    Combine the alpha channels of individually rendered strokes into the alpha channel of the full image.
+    This is the union of the strokes under the "over" operator, which is what rendering all the paths in a single svg does
+    """
+    if len(stroke_alphas) == 0:
+        raise Exception(
+            "Can't composite an image with no strokes, the image size is unknown"
+        )
+    return 1 - torch.prod(1 - torch.stack(stroke_alphas), 0)
+
+
+def get_stroke_occupancy(transformed_stroke):
+    polygon = get_transformed_polygons([transformed_stroke], OCCUPANCY_GRID_MATRIX)[0]
+    edges = compile_stroke(transformed_stroke.path).polygon_edges
+    return get_occupancy(polygon, edges, OCCUPANCY_GRID_SIZE)
 
 
-def create_boxy_strokes(size_px):
+def get_sample_rng(seed, index) -> random.Random:
     """
-    boxy strokes like in 口 or 户 really confuse the algorithm and are unlikely to form by randomly placing strokes.
-    This function explicitly tries to generate samples like this
+    The random number generator for sample number `index` of a run with this seed,
+    so that the sample is always the same no matter which process generates it
     """
-    horiz_stroke_path = random.choice(HORIZ_STROKE_CHAR_PATHS)
-    vert_stroke_path = random.choice(VERT_STROKE_CHAR_PATHS)
-    boxy_stroke_path = random.choice(BOXY_STROKE_CHAR_PATHS)
+    return random.Random(f"{seed}-{index}")
 
-    boxy_stroke = transform_stroke(
-        boxy_stroke_path, STROKE_VIEW_BOX, rotate_and_skew=False
-    )
-    vert_stroke = transform_stroke(
-        vert_stroke_path, STROKE_VIEW_BOX, rotate_and_skew=False
-    )
-    horiz_stroke = transform_stroke(
-        horiz_stroke_path, STROKE_VIEW_BOX, rotate_and_skew=False
-    )
 
-    boxy_mask, boxy_attrs = get_mask_and_attrs(boxy_stroke, size_px)
-    vert_mask, _ = get_mask_and_attrs(vert_stroke, size_px)
-    horiz_mask, _ = get_mask_and_attrs(horiz_stroke, size_px)
+def generate_strokes(size_px, max_strokes=4, rng: Optional[random.Random] = None):
+    """
+    Create the strokes for a single training example, returning (strokes, stroke_alphas, stroke_masks),
+    with stroke_masks stacked into a (S, H, W) bool tensor.
+    Randomness comes from rng if it's given, otherwise from the global random module
+    """
+    if rng is None:
+        rng = random
+    num_strokes = rng.randint(min(3, max_strokes), max_strokes)
+    with torch.no_grad():
+        strokes = []
+        stroke_alphas = []
+        stroke_masks = StrokeMaskStack()
+        # for 5% of training examples, make sure there's a boxy shape involved
+        if rng.random() <= 0.05:
+            count("boxy_samples")
+            strokes, stroke_alphas, boxy_masks = create_boxy_strokes(size_px, rng)
+            stroke_masks = StrokeMaskStack(boxy_masks)
+        occupancies = [get_stroke_occupancy(stroke) for stroke in strokes]
+        single_strokes = get_stroke_tables().single_strokes
+
+        while len(strokes) < num_strokes:
+            with stage("transform"):
+                stroke = transform_stroke(
+                    single_strokes.choice(rng), STROKE_VIEW_BOX, rng=rng
+                )
+            count("candidates")
+            with stage("prefilter"):
+                occupancy = get_stroke_occupancy(stroke)
+                obviously_bad = is_obviously_bad(
+                    occupancy, occupancies, PREFILTER_OVERLAP_RATIO
+                )
+            if obviously_bad:
+                count("prefiltered")
+                continue
+
+            stroke_alpha = render_stroke_alpha(stroke, size_px)
+            stroke_mask = alpha_to_mask(stroke_alpha)
+            count("rendered")
+
+            with stage("mask_check"):
+                is_good = stroke_masks.is_stroke_good(stroke_mask)
+            if is_good:
+                count("accepted")
+                strokes.append(stroke)
+                stroke_alphas.append(stroke_alpha)
+                stroke_masks.add(stroke_mask)
+                occupancies.append(occupancy)
+    return (strokes, stroke_alphas, stroke_masks.masks)
+
+
+def get_training_input_svg_and_masks(
+    size_px, max_strokes=4, rng: Optional[random.Random] = None
+):
+    """
+    Create a single training example
+    """
+    with stage("sample"):
+        count("samples")
+        strokes, _, stroke_masks = generate_strokes(size_px, max_strokes, rng)
+        input_svg = generate_svg(
+            [get_stroke_attrs(stroke) for stroke in strokes], STROKE_VIEW_BOX
+        )
+        return (input_svg, stroke_masks)
 
-    boxy_bounds = get_mask_bounds(boxy_mask)
-    vert_bounds = get_mask_bounds(vert_mask)
-    horiz_bounds = get_mask_bounds(horiz_mask)
 
-    x_ratio = VIEW_BOX_WIDTH / size_px
-    y_ratio = VIEW_BOX_HEIGHT / size_px
+def create_boxy_strokes(size_px, rng: Optional[random.Random] = None):
+    """
+    boxy strokes like in 口 or 户 really confuse the algorithm and are unlikely to form by randomly placing strokes.
+    This function explicitly tries to generate samples like this
+    """
+    if rng is None:
+        rng = random
+    stroke_tables = get_stroke_tables()
+    horiz_stroke_path = stroke_tables.horiz_strokes.choice(rng)
+    vert_stroke_path = stroke_tables.vert_strokes.choice(rng)
+    boxy_stroke_path = stroke_tables.boxy_strokes.choice(rng)
+
+    with stage("transform"):
+        boxy_stroke = transform_stroke(
+            boxy_stroke_path, STROKE_VIEW_BOX, rotate_and_skew=False, rng=rng
+        )
+        vert_stroke = transform_stroke(
+            vert_stroke_path, STROKE_VIEW_BOX, rotate_and_skew=False, rng=rng
+        )
+        horiz_stroke = transform_stroke(
+            horiz_stroke_path, STROKE_VIEW_BOX, rotate_and_skew=False, rng=rng
+        )
+
+    boxy_alpha = render_stroke_alpha(boxy_stroke, size_px)
+
+    # the alignment is worked out from the transformed outlines, in viewbox units,
+    # so only the final positions of the strokes need to be rendered
+    boxy_bounds, vert_bounds, horiz_bounds = [
+        get_polygon_bounds(polygon)
+        for polygon in get_transformed_polygons(
+            [boxy_stroke, vert_stroke, horiz_stroke]
+        )
+    ]
 
     # try to align the vert stroke to the top left of the boxy stroke
-    vert_delta_x = (boxy_bounds[0] - vert_bounds[0]) * x_ratio + random.gauss(0, 20)
-    vert_delta_y = (boxy_bounds[2] - vert_bounds[2]) * y_ratio + random.gauss(0, 3)
+    vert_delta_x = (boxy_bounds[0] - vert_bounds[0]) + rng.gauss(0, 20)
+    vert_delta_y = (boxy_bounds[2] - vert_bounds[2]) + rng.gauss(0, 3)
 
     updated_vert_stroke = replace(
         vert_stroke,
@@ -261,13 +465,11 @@ def create_boxy_strokes(size_px):
             vert_stroke.translate[1] + vert_delta_y,
         ),
     )
-    updated_vert_mask, updated_vert_attrs = get_mask_and_attrs(
-        updated_vert_stroke, size_px
-    )
+    updated_vert_alpha = render_stroke_alpha(updated_vert_stroke, size_px)
 
     # try to align the horizontal stroke with the bottom right of the boxy stroke
-    horiz_delta_x = (boxy_bounds[1] - horiz_bounds[1]) * x_ratio + random.gauss(0, 3)
-    horiz_delta_y = (boxy_bounds[3] - horiz_bounds[3]) * y_ratio + random.gauss(0, 20)
+    horiz_delta_x = (boxy_bounds[1] - horiz_bounds[1]) + rng.gauss(0, 3)
+    horiz_delta_y = (boxy_bounds[3] - horiz_bounds[3]) + rng.gauss(0, 20)
 
     updated_horiz_stroke = replace(
         horiz_stroke,
@@ -276,25 +478,53 @@ def create_boxy_strokes(size_px):
             horiz_stroke.translate[1] + horiz_delta_y,
         ),
     )
-    updated_horiz_mask, updated_horiz_attrs = get_mask_and_attrs(
-        updated_horiz_stroke, size_px
-    )
+    updated_horiz_alpha = render_stroke_alpha(updated_horiz_stroke, size_px)
 
-    stroke_masks = [boxy_mask, updated_vert_mask, updated_horiz_mask]
-    strokes_attrs = [boxy_attrs, updated_vert_attrs, updated_horiz_attrs]
-    return (strokes_attrs, stroke_masks)
+    stroke_alphas = [boxy_alpha, updated_vert_alpha, updated_horiz_alpha]
+    stroke_masks = [alpha_to_mask(stroke_alpha) for stroke_alpha in stroke_alphas]
+    strokes = [boxy_stroke, updated_vert_stroke, updated_horiz_stroke]
+    return (strokes, stroke_alphas, stroke_masks)
 
 
-def get_training_input_and_mask_tensors(size_px=256):
-    with torch.no_grad():
-        input_svg, stroke_masks = get_training_input_svg_and_masks(size_px)
+def get_training_input_and_mask_tensors(
+    size_px=256, composite=True, max_strokes=4, rng: Optional[random.Random] = None
+):
+    """
+    Create a single training example as (input, mask) tensors: a (1, H, W) float image between 0 and 1,
+    and (H, W) uint8 labels from get_labels.
+    If composite is true, the input image is built from the alpha channels of the already rendered strokes,
+    rather than rendering the full svg a second time
+    """
+    with torch.no_grad(), stage("sample"):
+        count("samples")
+        strokes, stroke_alphas, stroke_masks = generate_strokes(
+            size_px, max_strokes, rng
+        )
+
+        if composite:
+            input_tensor = composite_alphas(stroke_alphas)
+        else:
+            from .svg_to_pil import svg_to_pil
+
+            input_svg = generate_svg(
+                [get_stroke_attrs(stroke) for stroke in strokes], STROKE_VIEW_BOX
+            )
+            input_img = svg_to_pil(input_svg, size_px, size_px)
+            # PIL only decodes the png once the pixels are read
+            with stage("png_decode"):
+                input_tensor = img_to_greyscale_tensor(input_img)
+        with stage("labels"):
+            mask = get_labels(stroke_masks)
+        return (input_tensor.unsqueeze(0), mask)
 
-        input_img = svg_to_pil(input_svg, size_px, size_px)
-        input_tensor = img_to_greyscale_tensor(input_img)
-        mask_sums = torch.zeros(input_tensor.shape, dtype=torch.long)
-        for stroke_mask in stroke_masks:
-            mask_sums += stroke_mask
 
-        # collapse all overlaps of more than 2 items into a single "overlap" class
-        mask = torch.where(mask_sums > 2, 2, mask_sums)
-        return (input_tensor.unsqueeze(0), mask)
+def generate_sample(index, seed, size_px=256, composite=True, max_strokes=4):
+    """
+    Deterministically create sample number `index` of the run with this seed, as (input, mask) tensors
+    """
+    return get_training_input_and_mask_tensors(
+        size_px=size_px,
+        composite=composite,
+        max_strokes=max_strokes,
+        rng=get_sample_rng(seed, index),
+    )
@@ -0,0 +1,184 @@
+from functools import lru_cache
+from os import path, listdir
+from typing import Iterator, List, Optional, Tuple, Union
+import mmap
+import re
+import struct
+import numpy as np
+
+# A glyph pack is a single file holding the path of every glyph svg in a directory:
+#   header: magic, version, number of glyphs, flags
+#   index: one INDEX_DTYPE entry per glyph, sorted by codepoint
+#   data: the utf-8 path strings, back to back
+MAGIC = b"HZGP"
+VERSION = 1
+HEADER_FORMAT = "<4sIII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+FLAG_HAS_BBOX = 1
+INDEX_DTYPE = np.dtype(
+    [
+        ("codepoint", "<u4"),
+        ("offset", "<u8"),
+        ("length", "<u4"),
+        # (min_x, max_x, min_y, max_y) like svgpathtools bbox(), NaN if the pack was built without bboxes
+        ("bbox", "<f4", (4,)),
+    ]
+)
+
+path_extractor = re.compile(r'\bd="([^"]+)"')
+
+
+def read_glyph_svg_path(svg_file) -> Optional[str]:
+    "return the first path in a glyph svg file, or None if it doesn't have one"
+    with open(svg_file, "r") as contents:
+        char_svg = contents.read().replace("\n", "")
+    path_match = path_extractor.search(char_svg)
+    return path_match[1] if path_match else None
+
+
+def list_glyph_files(glyphs_dir) -> List[Tuple[int, str]]:
+    "return (codepoint, filename) for every <hex codepoint>.svg file in glyphs_dir, sorted by codepoint"
+    glyph_files = []
+    for filename in listdir(glyphs_dir):
+        name, ext = path.splitext(filename)
+        if ext == ".svg" and re.fullmatch(r"[0-9a-fA-F]+", name):
+            glyph_files.append((int(name, 16), filename))
+    return sorted(glyph_files)
+
+
+def pack_glyphs(glyphs_dir, pack_file, with_bbox=False, progress=None) -> int:
+    """
+    Pack the paths of all the <hex codepoint>.svg files in glyphs_dir into a single glyph pack file,
+    returning the number of glyphs packed. Glyphs without a path are skipped
+    """
+    entries = []
+    for codepoint, filename in list_glyph_files(glyphs_dir):
+        pathstr = read_glyph_svg_path(path.join(glyphs_dir, filename))
+        if pathstr is not None:
+            entries.append((codepoint, pathstr))
+        if progress:
+            progress()
+
+    index = np.zeros(len(entries), dtype=INDEX_DTYPE)
+    data = []
+    offset = 0
+    for i, (codepoint, pathstr) in enumerate(entries):
+        encoded = pathstr.encode("utf-8")
+        index[i]["codepoint"] = codepoint
+        index[i]["offset"] = offset
+        index[i]["length"] = len(encoded)
+        index[i]["bbox"] = np.nan
+        if with_bbox:
+            # deferred so packing without bboxes doesn't need svgpathtools
+            from svgpathtools import parse_path
+
+            index[i]["bbox"] = parse_path(pathstr).bbox()
+        data.append(encoded)
+        offset += len(encoded)
+
+    with open(pack_file, "wb") as out:
+        flags = FLAG_HAS_BBOX if with_bbox else 0
+        out.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(entries), flags))
+        out.write(index.tobytes())
+        out.write(b"".join(data))
+    return len(entries)
+
+
+class GlyphPack:
+    """
+    Memory-mapped reader for a glyph pack file. Looking up a glyph is a binary search
+    over the codepoints in the index, and only the pages holding that glyph's path are read
+    """
+
+    def __init__(self, pack_file):
+        self.pack_file = pack_file
+        with open(pack_file, "rb") as pack:
+            self.mmap = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, flags = struct.unpack_from(HEADER_FORMAT, self.mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise Exception(f"Not a version {VERSION} glyph pack: {pack_file}")
+        self.has_bbox = bool(flags & FLAG_HAS_BBOX)
+        self.index = np.frombuffer(
+            self.mmap, dtype=INDEX_DTYPE, count=count, offset=HEADER_SIZE
+        )
+        self.codepoints = self.index["codepoint"]
+        self.data_offset = HEADER_SIZE + self.index.nbytes
+
+    def __len__(self):
+        return len(self.index)
+
+    def find(self, codepoint: int) -> Optional[int]:
+        "return the position of the codepoint in the index, or None if it isn't in the pack"
+        position = int(np.searchsorted(self.codepoints, codepoint))
+        if position < len(self.codepoints) and self.codepoints[position] == codepoint:
+            return position
+        return None
+
+    def __contains__(self, char: str) -> bool:
+        return self.find(ord(char)) is not None
+
+    def get_path(self, char: str) -> Optional[str]:
+        position = self.find(ord(char))
+        if position is None:
+            return None
+        entry = self.index[position]
+        start = self.data_offset + int(entry["offset"])
+        return self.mmap[start : start + int(entry["length"])].decode("utf-8")
+
+    def get_bbox(self, char: str) -> Optional[Tuple[float, float, float, float]]:
+        position = self.find(ord(char))
+        if position is None or not self.has_bbox:
+            return None
+        return tuple(float(value) for value in self.index[position]["bbox"])
+
+    def chars(self) -> Iterator[str]:
+        return (chr(codepoint) for codepoint in self.codepoints)
+
+    def __getstate__(self):
+        # memory maps can't be sent to other processes, so they map the file again
+        return {"pack_file": self.pack_file}
+
+    def __setstate__(self, state):
+        self.__init__(state["pack_file"])
+
+
+class GlyphDir:
+    """
+    Reads glyphs straight from a directory of <hex codepoint>.svg files, with the same interface as GlyphPack.
+    Every lookup opens a file, so prefer a glyph pack for anything that reads a lot of glyphs
+    """
+
+    def __init__(self, glyphs_dir):
+        self.glyphs_dir = glyphs_dir
+        self.files = dict(list_glyph_files(glyphs_dir))
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, char: str) -> bool:
+        return ord(char) in self.files
+
+    def get_path(self, char: str) -> Optional[str]:
+        filename = self.files.get(ord(char))
+        if filename is None:
+            return None
+        return read_glyph_svg_path(path.join(self.glyphs_dir, filename))
+
+    def get_bbox(self, char: str) -> Optional[Tuple[float, float, float, float]]:
+        return None
+
+    def chars(self) -> Iterator[str]:
+        return (chr(codepoint) for codepoint in self.files)
+
+
+def open_glyphs(glyphs) -> Union[GlyphPack, GlyphDir]:
+    "open either a glyph pack file or a directory of glyph svgs"
+    return GlyphDir(glyphs) if path.isdir(glyphs) else GlyphPack(glyphs)
+
+
+@lru_cache(maxsize=None)
+def load_glyph_pack(pack_file) -> Optional[GlyphPack]:
+    "the glyph pack in this file, opened once per process, or None if it hasn't been built"
+    if not path.exists(pack_file):
+        return None
+    return GlyphPack(pack_file)
@@ -0,0 +1,136 @@
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Dict
+import time
+import torch
+
+# Counters and stage timers for the sample generator. Everything is a no-op until enable() is called
+# in the process doing the generating, so the generator pays close to nothing for them by default
+
+COUNTERS = [
+    "samples",
+    "boxy_samples",
+    "candidates",
+    "prefiltered",
+    "rendered",
+    "accepted",
+    "render_calls",
+    "svg_renders",
+]
+# "sample" covers generating a whole sample, the other stages are parts of it
+STAGES = [
+    "sample",
+    "transform",
+    "prefilter",
+    "render",
+    "mask",
+    "mask_check",
+    "composite",
+    "svg_render",
+    "png_decode",
+    "labels",
+]
+METRICS = COUNTERS + [f"time/{stage}" for stage in STAGES]
+METRIC_INDICES = {name: i for i, name in enumerate(METRICS)}
+
+enabled = False
+values = [0.0] * len(METRICS)
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    for i in range(len(values)):
+        values[i] = 0.0
+
+
+def snapshot() -> Dict[str, float]:
+    "the metrics collected in this process since the last reset"
+    return dict(zip(METRICS, values))
+
+
+def count(name: str, n=1):
+    if enabled:
+        values[METRIC_INDICES[name]] += n
+
+
+class StageTimer:
+    __slots__ = ("index", "start")
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        values[self.index] += time.perf_counter() - self.start
+
+
+NULL_STAGE = nullcontext()
+
+
+def stage(name: str):
+    "context manager adding the time spent inside it to the stage"
+    if not enabled:
+        return NULL_STAGE
+    return StageTimer(METRIC_INDICES[f"time/{name}"])
+
+
+def timed_stage(name: str):
+    "decorator adding the time spent in the function to the stage"
+
+    def decorator(fn):
+        @wraps(fn)
+        def timed_fn(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return timed_fn
+
+    return decorator
+
+
+class SharedStats:
+    """
+    Metrics from every DataLoader worker, in a shared memory tensor with a row per worker
+    (and one for the main process, for num_workers=0), so the training loop can read them live.
+    Hand it to the dataset, which wraps generating each sample in collect()
+    """
+
+    def __init__(self, num_workers: int):
+        self.values = torch.zeros(
+            (num_workers + 1, len(METRICS)), dtype=torch.float64
+        ).share_memory_()
+
+    @contextmanager
+    def collect(self):
+        """
+        collect metrics for the code inside this, adding them to this process's row when it's done.
+        Instrumentation is only enabled inside it, so the main process doesn't keep paying for it with num_workers=0
+        """
+        was_enabled = enabled
+        enable()
+        try:
+            yield
+        finally:
+            if not was_enabled:
+                disable()
+            worker_info = torch.utils.data.get_worker_info()
+            row = 0 if worker_info is None else worker_info.id + 1
+            self.values[row] += torch.tensor(values, dtype=torch.float64)
+            reset()
+
+    def totals(self) -> Dict[str, float]:
+        "the metrics summed over every worker"
+        return dict(zip(METRICS, self.values.sum(0).tolist()))
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import Sequence, Tuple
+import numpy as np
+
+
+@dataclass
+class StrokeOccupancy:
+    """
+    A coarse, low resolution picture of where a stroke is, used to throw away obviously bad
+    candidate strokes before paying for a full resolution render
+    """
+
+    # exact (min_x, max_x, min_y, max_y) of the stroke outline, in grid cells
+    bounds: Tuple[float, float, float, float]
+    # grid coordinates of the top left cell of the cells window
+    origin: Tuple[int, int]
+    # boolean grid of which cells have their center inside the stroke
+    cells: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return int(np.count_nonzero(self.cells))
+
+    def bounds_intersect(self, other: "StrokeOccupancy", padding=1.0) -> bool:
+        min_x, max_x, min_y, max_y = self.bounds
+        other_min_x, other_max_x, other_min_y, other_max_y = other.bounds
+        return (
+            min_x - padding <= other_max_x
+            and other_min_x - padding <= max_x
+            and min_y - padding <= other_max_y
+            and other_min_y - padding <= max_y
+        )
+
+    def overlap_size(self, other: "StrokeOccupancy") -> int:
+        "the number of cells occupied by both strokes"
+        x0 = max(self.origin[0], other.origin[0])
+        y0 = max(self.origin[1], other.origin[1])
+        x1 = min(
+            self.origin[0] + self.cells.shape[1], other.origin[0] + other.cells.shape[1]
+        )
+        y1 = min(
+            self.origin[1] + self.cells.shape[0], other.origin[1] + other.cells.shape[0]
+        )
+        if x1 <= x0 or y1 <= y0:
+            return 0
+        cells = self.cells[
+            y0 - self.origin[1] : y1 - self.origin[1],
+            x0 - self.origin[0] : x1 - self.origin[0],
+        ]
+        other_cells = other.cells[
+            y0 - other.origin[1] : y1 - other.origin[1],
+            x0 - other.origin[0] : x1 - other.origin[0],
+        ]
+        return int(np.count_nonzero(cells & other_cells))
+
+
+def get_occupancy(
+    polygon: np.ndarray, edges: np.ndarray, grid_size: int
+) -> StrokeOccupancy:
+    """
+    Rasterize a polygon, already in grid units, onto a grid_size x grid_size grid by testing
+    each cell center against the polygon using the nonzero winding rule, like svg fills do.
+    Only the cells inside the polygon's bounding box are tested
+    """
+    min_x, min_y = polygon.min(0)
+    max_x, max_y = polygon.max(0)
+    x0 = int(np.clip(np.floor(min_x), 0, grid_size))
+    x1 = int(np.clip(np.ceil(max_x), 0, grid_size))
+    y0 = int(np.clip(np.floor(min_y), 0, grid_size))
+    y1 = int(np.clip(np.ceil(max_y), 0, grid_size))
+    xs, ys = np.meshgrid(np.arange(x0, x1) + 0.5, np.arange(y0, y1) + 0.5)
+    px = xs.reshape(-1, 1)
+    py = ys.reshape(-1, 1)
+
+    start = polygon[edges[:, 0]]
+    end = polygon[edges[:, 1]]
+    ax, ay = start[:, 0], start[:, 1]
+    bx, by = end[:, 0], end[:, 1]
+    # > 0 if the point is left of the edge
+    side = (bx - ax) * (py - ay) - (px - ax) * (by - ay)
+    upward = (ay <= py) & (by > py) & (side > 0)
+    downward = (ay > py) & (by <= py) & (side < 0)
+    winding = np.count_nonzero(upward, 1) - np.count_nonzero(downward, 1)
+
+    return StrokeOccupancy(
+        bounds=(min_x, max_x, min_y, max_y),
+        origin=(x0, y0),
+        cells=(winding != 0).reshape(xs.shape),
+    )
+
+
+def is_obviously_bad(
+    occupancy: StrokeOccupancy,
+    existing_occupancies: Sequence[StrokeOccupancy],
+    max_overlap_ratio: float,
+) -> bool:
+    """
+    Cheap, conservative version of is_stroke_good run on coarse occupancy grids.
+    Like is_stroke_good, the first existing stroke that's decisive wins: one that can't overlap
+    at all means the candidate is fine. Anything that isn't a clear rejection is left for the full check
+    """
+    for existing in existing_occupancies:
+        if not occupancy.bounds_intersect(existing):
+            return False
+        if occupancy.size == 0 or existing.size == 0:
+            return False
+        overlap_size = occupancy.overlap_size(existing)
+        return (
+            overlap_size / occupancy.size > max_overlap_ratio
+            or overlap_size / existing.size > max_overlap_ratio
+        )
+    return False
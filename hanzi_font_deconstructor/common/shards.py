@@ -0,0 +1,214 @@
+from bisect import bisect_right
+from os import path, makedirs
+from typing import Dict, List, Sequence, Tuple
+import json
+import numpy as np
+import torch
+
+INDEX_FILE = "index.json"
+# the arrays stored in each shard, training samples by default
+SAMPLE_ARRAYS = ("images", "masks")
+# masks predicted for real glyphs, stored alongside the codepoint of each glyph
+PREDICTION_ARRAYS = ("codepoints", "masks")
+
+
+def image_to_uint8(image: torch.Tensor) -> np.ndarray:
+    "convert a (1, H, W) float image between 0 and 1 into an (H, W) uint8 array"
+    return (image.squeeze(0) * 255).round().clamp(0, 255).to(torch.uint8).numpy()
+
+
+def get_shard_files(
+    shards_dir, name: str, arrays: Sequence[str] = SAMPLE_ARRAYS
+) -> Tuple[str, ...]:
+    "return the file for each of the arrays in the shard with this name, (images file, masks file) by default"
+    return tuple(path.join(shards_dir, f"{name}.{array}.npy") for array in arrays)
+
+
+def write_shard_arrays(shards_dir, name: str, arrays: Dict[str, np.ndarray]) -> dict:
+    """
+    Write arrays with the same number of items as a single shard, returning its entry for the index
+    """
+    files = get_shard_files(shards_dir, name, list(arrays))
+    for file, values in zip(files, arrays.values()):
+        np.save(file, values)
+    return {"name": name, "count": len(next(iter(arrays.values())))}
+
+
+def write_shard(shards_dir, name: str, images: np.ndarray, masks: np.ndarray) -> dict:
+    """
+    Write (N, H, W) uint8 images and masks as a single shard, returning its entry for the index
+    """
+    return write_shard_arrays(shards_dir, name, {"images": images, "masks": masks})
+
+
+def write_shard_index(
+    shards_dir,
+    size_px: int,
+    shards: List[dict],
+    arrays: Sequence[str] = SAMPLE_ARRAYS,
+):
+    with open(path.join(shards_dir, INDEX_FILE), "w") as index_file:
+        json.dump(
+            {"size_px": size_px, "arrays": list(arrays), "shards": shards},
+            index_file,
+            indent=2,
+        )
+
+
+def read_shard_index(shards_dir) -> dict:
+    with open(path.join(shards_dir, INDEX_FILE), "r") as index_file:
+        return json.load(index_file)
+
+
+class ShardWriter:
+    """
+    Writes batches of items into fixed-size shards of arrays, plus an index. Every shard holds shard_size items
+    apart from the last one. The arrays are training samples' (images, masks) by default
+    """
+
+    def __init__(
+        self,
+        shards_dir,
+        size_px: int,
+        shard_size=1000,
+        name_prefix="shard",
+        arrays: Sequence[str] = SAMPLE_ARRAYS,
+    ):
+        makedirs(shards_dir, exist_ok=True)
+        self.shards_dir = shards_dir
+        self.size_px = size_px
+        self.shard_size = shard_size
+        self.name_prefix = name_prefix
+        self.arrays = tuple(arrays)
+        self.shards = []
+        # allocated from the first batch, so they take its item shapes and dtypes
+        self.buffers = None
+        self.count = 0
+
+    def write_batch(self, *batch: np.ndarray):
+        "add a batch of N items, as an array of N values for each of the arrays"
+        if self.buffers is None:
+            self.buffers = [
+                np.zeros((self.shard_size, *values.shape[1:]), dtype=values.dtype)
+                for values in batch
+            ]
+        written = 0
+        while written < len(batch[0]):
+            n = min(len(batch[0]) - written, self.shard_size - self.count)
+            batch_slice = slice(written, written + n)
+            shard_slice = slice(self.count, self.count + n)
+            for buffer, values in zip(self.buffers, batch):
+                buffer[shard_slice] = values[batch_slice]
+            self.count += n
+            written += n
+            if self.count == self.shard_size:
+                self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+        name = f"{self.name_prefix}-{len(self.shards):05d}"
+        arrays = {
+            array: buffer[: self.count]
+            for array, buffer in zip(self.arrays, self.buffers)
+        }
+        self.shards.append(write_shard_arrays(self.shards_dir, name, arrays))
+        self.count = 0
+
+    def close(self) -> List[dict]:
+        self.flush()
+        write_shard_index(self.shards_dir, self.size_px, self.shards, self.arrays)
+        return self.shards
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PredictionWriter(ShardWriter):
+    """
+    Writes batches of predicted (H, W) uint8 masks for glyphs into fixed-size shards, along with their codepoints
+    """
+
+    def __init__(self, shards_dir, size_px: int, shard_size=1000, name_prefix="shard"):
+        super().__init__(
+            shards_dir, size_px, shard_size, name_prefix, arrays=PREDICTION_ARRAYS
+        )
+
+    def write_batch(self, codepoints: np.ndarray, masks: np.ndarray):
+        "add (N,) codepoints and their (N, H, W) uint8 masks"
+        super().write_batch(np.asarray(codepoints, dtype=np.uint32), masks)
+
+
+class ShardReader:
+    """
+    Random access to the samples in a shards directory.
+    Shards are memory-mapped the first time they're read from, so only the pages that are used get loaded,
+    and each DataLoader worker maps its own copy
+    """
+
+    def __init__(self, shards_dir):
+        self.shards_dir = shards_dir
+        index = read_shard_index(shards_dir)
+        self.size_px = index["size_px"]
+        # shards written before the index listed its arrays are always training samples
+        self.arrays = tuple(index.get("arrays", SAMPLE_ARRAYS))
+        self.shards = index["shards"]
+        self.offsets = np.cumsum([0] + [shard["count"] for shard in self.shards])
+        self.mapped_shards = {}
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def get_shard(self, shard_index: int) -> Tuple[np.ndarray, ...]:
+        if shard_index not in self.mapped_shards:
+            files = get_shard_files(
+                self.shards_dir, self.shards[shard_index]["name"], self.arrays
+            )
+            self.mapped_shards[shard_index] = tuple(
+                np.load(file, mmap_mode="r") for file in files
+            )
+        return self.mapped_shards[shard_index]
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, ...]:
+        "return a value from each array for a sample, the (H, W) uint8 (image, mask) for training samples"
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError(f"Sample {index} is out of range")
+        shard_index = bisect_right(self.offsets, index) - 1
+        offset = index - self.offsets[shard_index]
+        return tuple(values[offset] for values in self.get_shard(shard_index))
+
+    def __getstate__(self):
+        # don't send memory maps to other processes, they'll map the shards themselves
+        state = self.__dict__.copy()
+        state["mapped_shards"] = {}
+        return state
+
+
+class PredictionReader(ShardReader):
+    """
+    Reads masks written by PredictionWriter, looking them up by character
+    """
+
+    def __init__(self, shards_dir):
+        super().__init__(shards_dir)
+        codepoints = [
+            np.load(get_shard_files(shards_dir, shard["name"], ["codepoints"])[0])
+            for shard in self.shards
+        ]
+        self.indices = {
+            int(codepoint): index
+            for index, codepoint in enumerate(np.concatenate(codepoints))
+        }
+
+    def __contains__(self, char: str) -> bool:
+        return ord(char) in self.indices
+
+    def get_mask(self, char: str) -> np.ndarray:
+        "return the predicted (H, W) uint8 mask for a character"
+        _codepoint, mask = self[self.indices[ord(char)]]
+        return mask
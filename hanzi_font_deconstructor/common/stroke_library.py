@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple, Union
+import random
+import numpy as np
+
+if TYPE_CHECKING:
+    from svgpathtools import Path
+
+# number of points each curved segment is flattened into for the polygon outline
+CURVE_FLATTEN_STEPS = 8
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledStroke:
+    """
+    A stroke path parsed once, along with everything about it that's needed to place it
+    """
+
+    path: str
+    parsed_path: "Path"
+    # (min_x, max_x, min_y, max_y), matching svgpathtools bbox()
+    bbox: Tuple[float, float, float, float]
+    midpoint: Tuple[float, float]
+    # (N, 2) array of points around the outline of the stroke, with curves flattened into lines
+    polygon: np.ndarray
+    # (E, 2) array of indices into polygon for each edge of the outline, with every contour closed
+    polygon_edges: np.ndarray
+
+
+def flatten_path(parsed_path: "Path") -> Tuple[np.ndarray, np.ndarray]:
+    "return the (points, edges) of the path outline, with curves flattened into lines"
+    from svgpathtools import Line
+
+    points = []
+    edges = []
+    contour_start = None
+    current_point = None
+
+    def close_contour():
+        if contour_start is not None and len(points) - 1 > contour_start:
+            edges.append((len(points) - 1, contour_start))
+
+    for segment in parsed_path:
+        if current_point is None or segment.start != current_point:
+            close_contour()
+            contour_start = len(points)
+            points.append(segment.start)
+        if isinstance(segment, Line):
+            segment_points = [segment.end]
+        else:
+            ts = np.linspace(0, 1, CURVE_FLATTEN_STEPS + 1)[1:]
+            segment_points = [segment.point(t) for t in ts]
+        for point in segment_points:
+            points.append(point)
+            edges.append((len(points) - 2, len(points) - 1))
+        current_point = segment.end
+    close_contour()
+    points = np.array(points, dtype=np.complex128)
+    return (
+        np.stack([points.real, points.imag], 1),
+        np.array(edges, dtype=np.int64).reshape(-1, 2),
+    )
+
+
+@lru_cache(maxsize=None)
+def compile_stroke(pathstr: str) -> CompiledStroke:
+    "parse a stroke path string, memoized so every path is only parsed once per process"
+    # svgpathtools is slow to import, so it's only imported once there's a path to parse
+    from svgpathtools import parse_path
+
+    parsed_path = parse_path(pathstr)
+    minX, maxX, minY, maxY = parsed_path.bbox()
+    polygon, polygon_edges = flatten_path(parsed_path)
+    return CompiledStroke(
+        path=pathstr,
+        parsed_path=parsed_path,
+        bbox=(minX, maxX, minY, maxY),
+        midpoint=((minX + maxX) / 2, (minY + maxY) / 2),
+        polygon=polygon,
+        polygon_edges=polygon_edges,
+    )
+
+
+def get_compiled_stroke(stroke: Union[str, CompiledStroke]) -> CompiledStroke:
+    return stroke if isinstance(stroke, CompiledStroke) else compile_stroke(stroke)
+
+
+class StrokeLibrary:
+    """
+    A fixed set of stroke paths to pick from when generating training data
+    """
+
+    def __init__(self, paths: Sequence[str]):
+        self.strokes = [compile_stroke(pathstr) for pathstr in paths]
+
+    def __len__(self):
+        return len(self.strokes)
+
+    def __getitem__(self, index) -> CompiledStroke:
+        return self.strokes[index]
+
+    def choice(self, rng: Optional[random.Random] = None) -> CompiledStroke:
+        return (rng or random).choice(self.strokes)
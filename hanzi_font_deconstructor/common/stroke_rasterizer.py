@@ -0,0 +1,125 @@
+from functools import lru_cache
+from typing import Tuple
+import cairocffi as cairo
+import numpy as np
+import torch
+from svgpathtools import Line, CubicBezier, QuadraticBezier
+from .TransformedStroke import TransformedStroke
+from .affine import get_viewbox_matrix
+from .stroke_library import compile_stroke
+
+# number of line segments used to approximate any arcs in a path
+ARC_STEPS = 16
+
+
+@lru_cache(maxsize=None)
+def path_to_cairo_path(pathstr: str):
+    """
+    Convert an svg path string into a list of (path_operation, coordinates) tuples,
+    in the format that cairo's append_path expects
+    """
+    cairo_path = []
+    current_point = None
+    for segment in compile_stroke(pathstr).parsed_path:
+        start = segment.start
+        end = segment.end
+        if current_point is None or start != current_point:
+            cairo_path.append((cairo.PATH_MOVE_TO, (start.real, start.imag)))
+        if isinstance(segment, Line):
+            cairo_path.append((cairo.PATH_LINE_TO, (end.real, end.imag)))
+        elif isinstance(segment, CubicBezier):
+            c1, c2 = segment.control1, segment.control2
+            cairo_path.append(
+                (
+                    cairo.PATH_CURVE_TO,
+                    (c1.real, c1.imag, c2.real, c2.imag, end.real, end.imag),
+                )
+            )
+        elif isinstance(segment, QuadraticBezier):
+            # cairo only has cubic curves, so elevate the quadratic curve to a cubic one
+            c1 = start + 2 / 3 * (segment.control - start)
+            c2 = end + 2 / 3 * (segment.control - end)
+            cairo_path.append(
+                (
+                    cairo.PATH_CURVE_TO,
+                    (c1.real, c1.imag, c2.real, c2.imag, end.real, end.imag),
+                )
+            )
+        else:
+            for t in np.linspace(0, 1, ARC_STEPS + 1)[1:]:
+                point = segment.point(t)
+                cairo_path.append((cairo.PATH_LINE_TO, (point.real, point.imag)))
+        current_point = end
+    return cairo_path
+
+
+def to_cairo_matrix(matrix: np.ndarray) -> cairo.Matrix:
+    return cairo.Matrix(
+        xx=matrix[0, 0],
+        yx=matrix[1, 0],
+        xy=matrix[0, 1],
+        yy=matrix[1, 1],
+        x0=matrix[0, 2],
+        y0=matrix[1, 2],
+    )
+
+
+class StrokeRasterizer:
+    """
+    Draws strokes straight onto a reusable A8 cairo surface, skipping the svg -> png -> PIL round trip.
+    The rendered alpha channel is exposed as a zero-copy view of the surface, so it's overwritten by the next render
+    """
+
+    def __init__(self, size_px: int, viewbox: Tuple[int, int, int, int]):
+        self.size_px = size_px
+        self.surface = cairo.ImageSurface(cairo.FORMAT_A8, size_px, size_px)
+        self.context = cairo.Context(self.surface)
+        self.viewbox_matrix = get_viewbox_matrix(viewbox, size_px, size_px)
+        # rows of an A8 surface are padded to the surface stride
+        stride = self.surface.get_stride()
+        self.buffer = np.frombuffer(self.surface.get_data(), dtype=np.uint8).reshape(
+            (size_px, stride)
+        )[:, :size_px]
+
+    def clear(self):
+        self.context.set_operator(cairo.OPERATOR_CLEAR)
+        self.context.paint()
+        self.context.set_operator(cairo.OPERATOR_OVER)
+
+    def draw(self, stroke: TransformedStroke):
+        "draw the stroke on top of whatever is already on the surface"
+        self.draw_path(stroke.path, stroke.matrix())
+
+    def draw_path(self, pathstr: str, matrix: np.ndarray):
+        "draw a path with a 3x3 affine matrix in viewbox units applied to it"
+        context = self.context
+        context.set_matrix(to_cairo_matrix(self.viewbox_matrix @ matrix))
+        context.new_path()
+        context.append_path(path_to_cairo_path(pathstr))
+        context.fill()
+
+    def render(self, stroke: TransformedStroke) -> np.ndarray:
+        "render a single stroke, returning a (size_px, size_px) uint8 view of the alpha channel"
+        self.clear()
+        self.draw(stroke)
+        self.surface.flush()
+        return self.buffer
+
+    def render_path(self, pathstr: str) -> np.ndarray:
+        "render an untransformed path, like a whole glyph, returning a (size_px, size_px) uint8 view of the alpha channel"
+        self.clear()
+        self.draw_path(pathstr, np.identity(3))
+        self.surface.flush()
+        return self.buffer
+
+    def render_tensor(self, stroke: TransformedStroke) -> torch.Tensor:
+        "render a single stroke, returning a (size_px, size_px) uint8 tensor sharing memory with the surface"
+        return torch.from_numpy(self.render(stroke))
+
+
+@lru_cache(maxsize=None)
+def get_stroke_rasterizer(
+    size_px: int, viewbox: Tuple[int, int, int, int]
+) -> StrokeRasterizer:
+    "return a rasterizer for this size, reused for every stroke rendered in this process"
+    return StrokeRasterizer(size_px, viewbox)
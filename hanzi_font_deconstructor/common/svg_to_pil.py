@@ -1,9 +1,12 @@
 from io import BytesIO
 from cairosvg import svg2png
 from PIL import Image
+from .instrumentation import count, timed_stage
 
 
+@timed_stage("svg_render")
 def svg_to_pil(svg: str, width: int, height: int):
+    count("svg_renders")
     out = BytesIO()
     svg2png(
         bytestring=svg.encode("utf-8"),
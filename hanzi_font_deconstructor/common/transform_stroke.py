@@ -1,19 +1,29 @@
-from svgpathtools import parse_path
-from typing import Tuple
+from typing import List, Optional, Sequence, Tuple, Union
+import numpy as np
 from .TransformedStroke import TransformedStroke
-from random import randint, uniform, gauss
+from .affine import get_stroke_matrices, transform_polygons
+from .stroke_library import CompiledStroke, compile_stroke, get_compiled_stroke
+import random
 
 
 def transform_stroke(
-    stroke_pathstr: str, viewbox: Tuple[int, int, int, int], rotate_and_skew=True
+    stroke_path: Union[str, CompiledStroke],
+    viewbox: Tuple[int, int, int, int],
+    rotate_and_skew=True,
+    rng: Optional[random.Random] = None,
 ) -> TransformedStroke:
-    path = parse_path(stroke_pathstr)
-    strokeMinX, strokeMaxX, strokeMinY, strokeMaxY = path.bbox()
+    """
+    Randomly place, rotate, skew and scale a stroke inside the viewbox.
+    Randomness comes from rng if it's given, otherwise from the global random module
+    """
+    if rng is None:
+        rng = random
+    stroke = get_compiled_stroke(stroke_path)
+    strokeMinX, strokeMaxX, strokeMinY, strokeMaxY = stroke.bbox
     vbMinX, vbMinY, vbWidth, vbHeight = viewbox
     vbMaxX = vbMinX + vbWidth
     vbMaxY = vbMinY + vbHeight
-    strokeMidX = (strokeMaxX + strokeMinX) / 2
-    strokeMidY = (strokeMaxY + strokeMinY) / 2
+    strokeMidX, strokeMidY = stroke.midpoint
 
     rotate = 0
     skewX = 0
@@ -21,19 +31,19 @@ def transform_stroke(
     scaleX = 1
     scaleY = 1
     if rotate_and_skew:
-        rotate = gauss(0, 3)
-        skewX = gauss(0, 2)
-        skewY = gauss(0, 2)
-        scaleX = min(1.05, max(0.5, gauss(0.8, 0.2)))
-        scaleY = scaleX * uniform(0.95, 1.05)
+        rotate = rng.gauss(0, 3)
+        skewX = rng.gauss(0, 2)
+        skewY = rng.gauss(0, 2)
+        scaleX = min(1.05, max(0.5, rng.gauss(0.8, 0.2)))
+        scaleY = scaleX * rng.uniform(0.95, 1.05)
 
     # from https://stackoverflow.com/a/11671373
     baseTranslateX = (1 - scaleX) * strokeMidX
     baseTranslateY = (1 - scaleY) * strokeMidY
-    translateX = baseTranslateX + randint(
+    translateX = baseTranslateX + rng.randint(
         int(vbMinX - strokeMinX), int(vbMaxX - strokeMaxX)
     )
-    translateY = baseTranslateY + randint(
+    translateY = baseTranslateY + rng.randint(
         int(vbMinY - strokeMinY), int(vbMaxY - strokeMaxY)
     )
 
@@ -43,5 +53,30 @@ def transform_stroke(
         scale=(scaleX, scaleY),
         skewX=skewX,
         skewY=skewY,
-        path=stroke_pathstr,
+        path=stroke.path,
     )
+
+
+def get_strokes_matrices(strokes: Sequence[TransformedStroke]) -> np.ndarray:
+    "the (N, 3, 3) affine matrices for a list of strokes"
+    return get_stroke_matrices(
+        [stroke.translate for stroke in strokes],
+        [stroke.rotate for stroke in strokes],
+        [stroke.skewX for stroke in strokes],
+        [stroke.skewY for stroke in strokes],
+        [stroke.scale for stroke in strokes],
+    )
+
+
+def get_transformed_polygons(
+    strokes: Sequence[TransformedStroke], matrix: Optional[np.ndarray] = None
+) -> List[np.ndarray]:
+    """
+    The flattened outlines of a list of strokes with their transforms applied, in a single batched call.
+    If matrix is given, it's applied after the stroke transforms, e.g. to map the viewbox onto pixels
+    """
+    matrices = get_strokes_matrices(strokes)
+    if matrix is not None:
+        matrices = matrix @ matrices
+    polygons = [compile_stroke(stroke.path).polygon for stroke in strokes]
+    return transform_polygons(matrices, polygons)
@@ -1,4 +1,9 @@
 import torch
+from hanzi_font_deconstructor.common.batches import (
+    images_to_device,
+    masks_to_device,
+    uint8_sample,
+)
 from hanzi_font_deconstructor.common.generate_training_data import (
     get_training_input_and_mask_tensors,
 )
@@ -17,10 +22,20 @@ class RandomStrokesDataset(torch.utils.data.IterableDataset):
         for _ in range(total_per_worker):
             with torch.no_grad():
                 input, mask = get_training_input_and_mask_tensors(size_px=self.size_px)
-                # convert to float, scaled between 0 - 1 (2 is the overlap mask class)
-                # unsqueeze to make a 1-channel image
-                target = mask.unsqueeze(0) / 2
-            yield input, target
+                sample = uint8_sample(input, mask)
+            # both stay uint8 until they're on the device, see to_device()
+            # unsqueeze to make a 1-channel image
+            yield sample["image"], sample["mask"].unsqueeze(0)
+
+    @staticmethod
+    def to_device(input, target, device):
+        """
+        convert a batch to floats on the device, with the target scaled between 0 - 1 (2 is the overlap mask class)
+        """
+        return (
+            images_to_device(input, device),
+            masks_to_device(target, device, torch.float32) / 2,
+        )
 
     def __len__(self):
         return self.total_samples
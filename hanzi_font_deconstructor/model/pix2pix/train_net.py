@@ -30,8 +30,7 @@ def inner_train_loop(
     loop = tqdm(loader, leave=True)
 
     for idx, (x, y) in enumerate(loop):
-        x = x.to(device)
-        y = y.to(device)
+        x, y = RandomStrokesDataset.to_device(x, y, device)
 
         # Train Discriminator
         with torch.cuda.amp.autocast():
@@ -109,6 +108,7 @@ def train_net(
         train_dataset,
         batch_size=batch_size,
         num_workers=num_workers,
+        pin_memory=torch.device(device).type == "cuda",
     )
     g_scaler = torch.cuda.amp.GradScaler()
     d_scaler = torch.cuda.amp.GradScaler()
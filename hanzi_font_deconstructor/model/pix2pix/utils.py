@@ -2,11 +2,12 @@
 
 import torch
 from torchvision.utils import save_image
+from .RandomStrokesDataset import RandomStrokesDataset
 
 
 def save_some_examples(gen, val_loader, epoch, folder, device):
     x, y = next(iter(val_loader))
-    x, y = x.to(device), y.to(device)
+    x, y = RandomStrokesDataset.to_device(x, y, device)
     gen.eval()
     with torch.no_grad():
         y_fake = gen(x)
@@ -0,0 +1,41 @@
+import numpy as np
+import torch
+from hanzi_font_deconstructor.common.generate_training_data import STROKE_VIEW_BOX
+from hanzi_font_deconstructor.common.glyph_pack import open_glyphs
+
+
+class GlyphDataset(torch.utils.data.Dataset):
+    def __init__(self, glyphs, chars=None, size_px=512):
+        """
+        Real glyphs to run the model on, read from a glyph pack file or a directory of glyph svgs.
+        Glyphs are rendered in the same viewbox as the training strokes, so they're at the same scale
+        the model was trained on. Defaults to every glyph available.
+        Images are uint8, use collate_uint8 to batch them
+        """
+        super().__init__()
+        self.glyphs = open_glyphs(glyphs)
+        self.chars = list(chars) if chars is not None else list(self.glyphs.chars())
+        self.size_px = size_px
+
+    def __getitem__(self, index):
+        # cairo is only loaded in the processes that render
+        from hanzi_font_deconstructor.common.stroke_rasterizer import (
+            get_stroke_rasterizer,
+        )
+
+        char = self.chars[index]
+        pathstr = self.glyphs.get_path(char)
+        if pathstr is None:
+            # blank glyphs, like spaces, have nothing to deconstruct
+            alpha = np.zeros((self.size_px, self.size_px), dtype=np.uint8)
+        else:
+            rasterizer = get_stroke_rasterizer(self.size_px, STROKE_VIEW_BOX)
+            alpha = rasterizer.render_path(pathstr)
+        return {
+            # copied, since the rasterizer reuses its buffer
+            "image": torch.from_numpy(alpha.copy()).unsqueeze(0),
+            "codepoint": ord(char),
+        }
+
+    def __len__(self):
+        return len(self.chars)
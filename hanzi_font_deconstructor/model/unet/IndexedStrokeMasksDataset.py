@@ -0,0 +1,46 @@
+from contextlib import nullcontext
+from typing import Optional
+import random
+import torch
+from hanzi_font_deconstructor.common.batches import uint8_sample
+from hanzi_font_deconstructor.common.generate_training_data import generate_sample
+from hanzi_font_deconstructor.common.instrumentation import SharedStats
+
+
+class IndexedStrokeMasksDataset(torch.utils.data.Dataset):
+    def __init__(
+        self,
+        total_samples: int,
+        size_px=512,
+        seed=None,
+        stats: Optional[SharedStats] = None,
+    ):
+        """
+        Map-style version of RandomStrokeMasksDataset. Sample i is generated deterministically from the seed,
+        so DataLoader can shard, shuffle and prefetch it across any number of workers.
+        Call set_epoch() before each epoch to get a fresh set of samples.
+        If stats are given, the generator's instrumentation is collected into them from every worker.
+        Samples are uint8, use collate_uint8 to batch them
+        """
+        super().__init__()
+        self.total_samples = total_samples
+        self.size_px = size_px
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.epoch = 0
+        self.stats = stats
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __getitem__(self, index):
+        if index < 0 or index >= self.total_samples:
+            raise IndexError(f"Sample {index} is out of range")
+        # number samples across epochs, so every epoch sees different samples
+        with self.stats.collect() if self.stats else nullcontext():
+            input, mask = generate_sample(
+                self.epoch * self.total_samples + index, self.seed, size_px=self.size_px
+            )
+        return uint8_sample(input, mask)
+
+    def __len__(self):
+        return self.total_samples
@@ -1,4 +1,5 @@
 import torch
+from hanzi_font_deconstructor.common.batches import uint8_sample
 from hanzi_font_deconstructor.common.generate_training_data import (
     get_training_input_and_mask_tensors,
 )
@@ -20,16 +21,14 @@ class RandomStrokeMasksDataset(torch.utils.data.IterableDataset):
 
     def generate_sample(self):
         input, mask = get_training_input_and_mask_tensors(size_px=self.size_px)
-        return {
-            "image": input,
-            "mask": mask,
-        }
+        return uint8_sample(input, mask)
 
     def __iter__(self):
         worker_info = torch.utils.data.get_worker_info()
         num_workers = worker_info.num_workers if worker_info else 1
-        total_per_worker = int(self.total_samples / num_workers)
-        for i in range(total_per_worker):
+        worker_id = worker_info.id if worker_info else 0
+        # each worker takes every num_workers-th sample, so together they produce exactly total_samples
+        for i in range(worker_id, self.total_samples, num_workers):
             if self.pregenerated_samples:
                 yield self.pregenerated_samples[i]
             else:
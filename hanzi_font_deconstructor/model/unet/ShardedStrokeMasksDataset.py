@@ -0,0 +1,28 @@
+import numpy as np
+import torch
+from hanzi_font_deconstructor.common.shards import ShardReader
+
+
+class ShardedStrokeMasksDataset(torch.utils.data.Dataset):
+    def __init__(self, shards_dir):
+        """
+        Pregenerated samples read from memory-mapped shards written by create_training_data.py --format shards.
+        Samples are uint8, like the shards, use collate_uint8 to batch them
+        """
+        super().__init__()
+        self.samples = ShardReader(shards_dir)
+        self.size_px = self.samples.size_px
+
+    def set_epoch(self, epoch: int):
+        "the shards hold the same samples every epoch"
+
+    def __getitem__(self, index):
+        image, mask = self.samples[index]
+        # copied out of the read-only memory maps
+        return {
+            "image": torch.from_numpy(np.array(image)).unsqueeze(0),
+            "mask": torch.from_numpy(np.array(mask)),
+        }
+
+    def __len__(self):
+        return len(self.samples)
@@ -0,0 +1,125 @@
+from pathlib import Path
+from typing import Optional, Union
+import logging
+import torch
+from torch.utils.data import DataLoader
+from hanzi_font_deconstructor.common.batches import collate_uint8
+from .IndexedStrokeMasksDataset import IndexedStrokeMasksDataset
+
+
+class ValidationSet:
+    def __init__(
+        self, images: torch.Tensor, masks: torch.Tensor, batch_size=32, seed=None
+    ):
+        """
+        Validation samples generated once and kept as stacked uint8 tensors, so evaluating only pays for the net.
+        Iterating gives batches like collate_uint8 does, sliced out of the stacks without copying
+        """
+        self.images = images
+        self.masks = masks
+        self.batch_size = batch_size
+        self.seed = seed
+
+    @classmethod
+    def generate(
+        cls, total_samples: int, size_px=512, seed=None, num_workers=0, batch_size=32
+    ):
+        "generate the samples in parallel, like IndexedStrokeMasksDataset does for training"
+        dataset = IndexedStrokeMasksDataset(total_samples, size_px=size_px, seed=seed)
+        images = torch.empty((total_samples, 1, size_px, size_px), dtype=torch.uint8)
+        masks = torch.empty((total_samples, size_px, size_px), dtype=torch.uint8)
+        loader = DataLoader(
+            dataset,
+            batch_size=batch_size,
+            num_workers=num_workers,
+            collate_fn=collate_uint8,
+        )
+        start = 0
+        for batch in loader:
+            end = start + len(batch["image"])
+            images[start:end] = batch["image"]
+            masks[start:end] = batch["mask"]
+            start = end
+        return cls(images, masks, batch_size=batch_size, seed=dataset.seed)
+
+    @classmethod
+    def load_or_generate(
+        cls,
+        cache_file: Union[str, Path],
+        total_samples: int,
+        size_px=512,
+        seed=None,
+        num_workers=0,
+        batch_size=32,
+    ):
+        """
+        load the samples from cache_file if it holds the same samples, otherwise generate and save them there.
+        Needs a seed, otherwise the cache can never match
+        """
+        cache_file = Path(cache_file)
+        if cache_file.exists():
+            cached = torch.load(cache_file)
+            if (cached["total_samples"], cached["size_px"], cached["seed"]) == (
+                total_samples,
+                size_px,
+                str(seed),
+            ):
+                return cls(
+                    cached["images"],
+                    cached["masks"],
+                    batch_size=batch_size,
+                    seed=cached["seed"],
+                )
+            logging.info(
+                f"{cache_file} holds different validation samples, regenerating"
+            )
+        validation_set = cls.generate(
+            total_samples,
+            size_px=size_px,
+            seed=seed,
+            num_workers=num_workers,
+            batch_size=batch_size,
+        )
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(
+            {
+                "total_samples": total_samples,
+                "size_px": size_px,
+                "seed": str(validation_set.seed),
+                "images": validation_set.images,
+                "masks": validation_set.masks,
+            },
+            cache_file,
+        )
+        return validation_set
+
+    def subset(self, total_samples: Optional[int]) -> "ValidationSet":
+        "the first total_samples samples, sharing this set's tensors"
+        if total_samples is None or total_samples >= len(self.images):
+            return self
+        return ValidationSet(
+            self.images[:total_samples],
+            self.masks[:total_samples],
+            batch_size=self.batch_size,
+            seed=self.seed,
+        )
+
+    def pin_memory(self) -> "ValidationSet":
+        "pin the tensors, for faster non-blocking copies to cuda"
+        return ValidationSet(
+            self.images.pin_memory(),
+            self.masks.pin_memory(),
+            batch_size=self.batch_size,
+            seed=self.seed,
+        )
+
+    def __iter__(self):
+        for start in range(0, len(self.images), self.batch_size):
+            yield {
+                "image": self.images[start : start + self.batch_size],
+                "mask": self.masks[start : start + self.batch_size],
+            }
+
+    def __len__(self):
+        "the number of batches, like a DataLoader"
+        return -(-len(self.images) // self.batch_size)
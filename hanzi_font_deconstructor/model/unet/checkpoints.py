@@ -0,0 +1,187 @@
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import Any, Dict, Optional, Union
+import os
+import random
+import numpy as np
+import torch
+
+# Full training state, so a preempted run can pick up where it left off, down to the next sample
+
+CHECKPOINT_VERSION = 2
+LATEST_CHECKPOINT = "CP_latest.pth"
+
+
+def to_cpu(value):
+    "copy the tensors in a state dict to the cpu, so training can keep updating the originals while it's saved"
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu", copy=True)
+    if isinstance(value, dict):
+        return {key: to_cpu(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(to_cpu(item) for item in value)
+    return value
+
+
+def get_rng_states() -> Dict[str, Any]:
+    states = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        states["cuda"] = torch.cuda.get_rng_state_all()
+    return states
+
+
+def set_rng_states(states: Dict[str, Any]):
+    random.setstate(states["python"])
+    np.random.set_state(states["numpy"])
+    torch.set_rng_state(states["torch"])
+    if "cuda" in states and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(states["cuda"])
+
+
+def get_training_state(
+    net,
+    optimizer,
+    scheduler,
+    epoch: int,
+    epoch_samples: int,
+    global_step: int,
+    seed: int,
+    settings: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Snapshot everything needed to resume training. epoch_samples is how many samples of the epoch are done,
+    and the dataset seed pins down which samples the rest of the run sees. settings are the training settings
+    a resumed run has to match, for the samples and steps to line up
+    """
+    return {
+        "version": CHECKPOINT_VERSION,
+        "net": to_cpu(net.state_dict()),
+        "optimizer": to_cpu(optimizer.state_dict()),
+        "scheduler": to_cpu(scheduler.state_dict()),
+        "epoch": epoch,
+        "epoch_samples": epoch_samples,
+        "global_step": global_step,
+        "seed": seed,
+        "settings": settings,
+        "rng": get_rng_states(),
+    }
+
+
+def restore_training_state(
+    checkpoint: Dict[str, Any],
+    net,
+    optimizer,
+    scheduler,
+    settings: Optional[Dict[str, Any]] = None,
+):
+    """
+    load a checkpoint from get_training_state() back into the net, optimizer, scheduler and rngs.
+    If settings are given, they have to match the ones the checkpoint was saved with
+    """
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise Exception(
+            f"Unsupported checkpoint version {checkpoint.get('version')}, expected {CHECKPOINT_VERSION}"
+        )
+    if settings is not None:
+        mismatched = [
+            f"{name}={value} (was {checkpoint['settings'].get(name)})"
+            for name, value in settings.items()
+            if checkpoint["settings"].get(name) != value
+        ]
+        if mismatched:
+            raise Exception(
+                f"Can't resume with different settings: {', '.join(mismatched)}"
+            )
+    net.load_state_dict(checkpoint["net"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    scheduler.load_state_dict(checkpoint["scheduler"])
+    set_rng_states(checkpoint["rng"])
+
+
+def load_checkpoint(checkpoint_file: Union[str, Path], device="cpu") -> Dict[str, Any]:
+    # rng states and optimizer settings aren't plain tensors
+    return torch.load(checkpoint_file, map_location=device, weights_only=False)
+
+
+def load_net_state(checkpoint_file: Union[str, Path], device="cpu"):
+    "the net's state dict from either a full training checkpoint or a plain CP_epoch file"
+    checkpoint = load_checkpoint(checkpoint_file, device)
+    if "version" in checkpoint and "net" in checkpoint:
+        return checkpoint["net"]
+    return checkpoint
+
+
+def save_checkpoint(checkpoint: Dict[str, Any], dest: Union[str, Path]):
+    "write via a temporary file, so a run killed mid-save never leaves a truncated checkpoint behind"
+    tmp = f"{dest}.tmp"
+    torch.save(checkpoint, tmp)
+    os.replace(tmp, dest)
+
+
+class CheckpointWriter:
+    """
+    Saves checkpoints on a background thread, so the training loop only pays for copying the state to the cpu.
+    At most one save is queued behind the one being written, write() blocks if both are taken
+    """
+
+    def __init__(self):
+        self.queue: Queue = Queue(maxsize=1)
+        self.error: Optional[BaseException] = None
+        self.thread = Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                save_checkpoint(*item)
+            except BaseException as err:
+                self.error = err
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise Exception("Failed to write checkpoint") from error
+
+    def write(self, checkpoint: Dict[str, Any], dest: Union[str, Path]):
+        self._raise_error()
+        self.queue.put((checkpoint, dest))
+
+    def flush(self):
+        "wait for every queued checkpoint to be written"
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class OffsetSampler(torch.utils.data.Sampler):
+    "sequential sampler starting partway through the dataset, to resume an epoch at the sample it stopped at"
+
+    def __init__(self, length: int, start=0):
+        self.length = length
+        self.start = start
+
+    def __iter__(self):
+        return iter(range(self.start, self.length))
+
+    def __len__(self):
+        return self.length - self.start
@@ -1,46 +1,77 @@
 import torch
-from torch.autograd import Function
+import torch.nn as nn
+import torch.nn.functional as F
 
+EPS = 0.0001
 
-class DiceCoeff(Function):
-    """Dice coeff for individual examples"""
 
-    def forward(self, input, target):
-        self.save_for_backward(input, target)
-        eps = 0.0001
-        self.inter = torch.dot(input.view(-1), target.view(-1))
-        self.union = torch.sum(input) + torch.sum(target) + eps
+def dice_and_iou(input, target, eps=EPS):
+    """
+    Per-sample, per-class Dice and IoU for the whole batch at once.
+    input and target are (N, C, H, W) probabilities or 0/1 masks, returns two (N, C) tensors.
+    A class missing from both a sample's input and target scores 1
+    """
+    dims = tuple(range(2, input.dim()))
+    inter = (input * target).sum(dims)
+    total = input.sum(dims) + target.sum(dims)
+    dice = (2 * inter + eps) / (total + eps)
+    iou = (inter + eps) / (total - inter + eps)
+    return dice, iou
 
-        t = (2 * self.inter.float() + eps) / self.union.float()
-        return t
 
-    # This function has only a single output, so it gets only one gradient
-    def backward(self, grad_output):
+def one_hot_masks(masks, n_classes: int):
+    "(N, H, W) class indices to (N, C, H, W) float 0/1 masks"
+    return F.one_hot(masks.long(), n_classes).permute(0, 3, 1, 2).float()
 
-        input, target = self.saved_variables
-        grad_input = grad_target = None
 
-        if self.needs_input_grad[0]:
-            grad_input = (
-                grad_output
-                * 2
-                * (target * self.union - self.inter)
-                / (self.union * self.union)
-            )
-        if self.needs_input_grad[1]:
-            grad_target = None
+def predicted_masks(logits):
+    "the net's (N, C, H, W) logits to 0/1 masks of the predicted class, or of probability > 0.5 for 1 class"
+    if logits.shape[1] == 1:
+        return (logits > 0).float()
+    return one_hot_masks(logits.argmax(1), logits.shape[1])
 
-        return grad_input, grad_target
+
+def multiclass_scores(logits, target):
+    """
+    Dice and IoU of the predicted classes, like dice_and_iou().
+    target is (N, H, W) class indices, or (N, 1, H, W) 0/1 masks for a 1-class net
+    """
+    if logits.shape[1] == 1:
+        target = target.float().reshape(logits.shape)
+    else:
+        target = one_hot_masks(target, logits.shape[1])
+    return dice_and_iou(predicted_masks(logits), target)
 
 
 def dice_coeff(input, target):
-    """Dice coeff for batches"""
-    if input.is_cuda:
-        s = torch.FloatTensor(1).cuda().zero_()
-    else:
-        s = torch.FloatTensor(1).zero_()
+    """Dice coeff for batches, averaged over the samples"""
+    n = input.shape[0]
+    dice, _ = dice_and_iou(input.reshape(n, 1, -1).float(), target.reshape(n, 1, -1))
+    return dice.mean()
+
 
-    for i, c in enumerate(zip(input, target)):
-        s = s + DiceCoeff().forward(c[0], c[1])
+class DiceLoss(nn.Module):
+    def __init__(self, class_weights=None):
+        """
+        Soft Dice loss of the net's logits against (N, H, W) class indices, or (N, 1, H, W) 0/1 masks for
+        a 1-class net: 1 - the mean Dice of the softmax (or sigmoid) probabilities over samples and classes.
+        class_weights weights the classes' Dice, to make a rare class like overlaps count more
+        """
+        super().__init__()
+        self.register_buffer(
+            "class_weights",
+            None if class_weights is None else torch.as_tensor(class_weights).float(),
+        )
 
-    return s / (i + 1)
+    def forward(self, logits, target):
+        logits = logits.float()
+        if logits.shape[1] == 1:
+            probs = torch.sigmoid(logits)
+            target = target.float().reshape(logits.shape)
+        else:
+            probs = torch.softmax(logits, dim=1)
+            target = one_hot_masks(target, logits.shape[1])
+        dice, _ = dice_and_iou(probs, target)
+        if self.class_weights is None:
+            return 1 - dice.mean()
+        return 1 - (dice * self.class_weights).sum(1).mean() / self.class_weights.sum()
@@ -1,35 +1,45 @@
 # from https://github.com/milesial/Pytorch-UNet
 
+from typing import Optional
 import torch
 import torch.nn.functional as F
 from tqdm import tqdm
 
 from .dice_loss import dice_coeff
+from .metrics import ConfusionMatrix
+from hanzi_font_deconstructor.common.batches import images_to_device, masks_to_device
 
 
-def eval_net(net, loader, device):
-    """Evaluation without the densecrf with the dice coefficient"""
+def eval_net(net, loader, device, confusion_matrix: Optional[ConfusionMatrix] = None):
+    """
+    Evaluation without the densecrf with the dice coefficient.
+    If a confusion matrix is given, every batch's predictions are added to it too.
+    The scores stay on the device until the end, so the device is only synced once
+    """
     net.eval()
     mask_type = torch.float32 if net.n_classes == 1 else torch.long
     n_val = len(loader)  # the number of batch
-    tot = 0
+    tot = torch.zeros((), device=device)
 
-    with tqdm(total=n_val, desc="Validation round", unit="batch", leave=False) as pbar:
+    with tqdm(
+        total=n_val, desc="Validation round", unit="batch", leave=False
+    ) as pbar, torch.inference_mode():
         for batch in loader:
             imgs, true_masks = batch["image"], batch["mask"]
-            imgs = imgs.to(device=device, dtype=torch.float32)
-            true_masks = true_masks.to(device=device, dtype=mask_type)
+            imgs = images_to_device(imgs, device)
+            true_masks = masks_to_device(true_masks, device, mask_type)
 
-            with torch.no_grad():
-                mask_pred = net(imgs)
+            mask_pred = net(imgs)
 
             if net.n_classes > 1:
-                tot += F.cross_entropy(mask_pred, true_masks).item()
+                tot += F.cross_entropy(mask_pred, true_masks)
             else:
                 pred = torch.sigmoid(mask_pred)
                 pred = (pred > 0.5).float()
-                tot += dice_coeff(pred, true_masks).item()
+                tot += dice_coeff(pred, true_masks)
+            if confusion_matrix is not None:
+                confusion_matrix.update(mask_pred, true_masks)
             pbar.update()
 
     net.train()
-    return tot / n_val
+    return tot.item() / n_val
@@ -0,0 +1,154 @@
+from typing import Iterable, Optional, Tuple
+import copy
+import io
+import json
+import torch
+import torch.nn as nn
+from torch.ao.quantization import fuse_modules, get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+from .UNet import DoubleConv
+
+EXPORT_INFO_FILE = "export.json"
+PARITY_FILE = "parity.pt"
+# how far an exported net's logits can be from the eager net's for the same input.
+# int8 nets are only expected to agree on the predicted classes
+FLOAT_PARITY_ATOL = 1e-3
+INT8_PARITY_AGREEMENT = 0.98
+
+
+class ExportedNet(nn.Module):
+    """
+    A net loaded by load_exported_net, with the same n_channels and n_classes as the UNet it was exported from,
+    so it can be used anywhere the UNet is for inference
+    """
+
+    def __init__(self, scripted, n_channels: int, n_classes: int, quantized: bool):
+        super().__init__()
+        self.scripted = scripted
+        self.n_channels = n_channels
+        self.n_classes = n_classes
+        self.quantized = quantized
+
+    def forward(self, x):
+        return self.scripted(x)
+
+
+def fuse_net(net: nn.Module) -> nn.Module:
+    """
+    Return an inference copy of a UNet with every conv => BN => ReLU in its DoubleConvs fused into
+    a single conv, with the batch norm folded into the conv weights
+    """
+    fused = copy.deepcopy(net).eval()
+    for module in fused.modules():
+        if isinstance(module, DoubleConv):
+            fuse_modules(
+                module.double_conv, [["0", "1", "2"], ["3", "4", "5"]], inplace=True
+            )
+    return fused
+
+
+def quantize_net(
+    fused_net: nn.Module, calibration_imgs: Iterable[torch.Tensor]
+) -> nn.Module:
+    """
+    Static int8 quantization with FX graph mode, calibrating activation ranges on (N, C, H, W) batches of imgs.
+    Dynamic quantization doesn't help here, since it only covers linear and recurrent layers
+    """
+    calibration_imgs = list(calibration_imgs)
+    prepared = prepare_fx(
+        copy.deepcopy(fused_net),
+        get_default_qconfig_mapping(torch.backends.quantized.engine),
+        (calibration_imgs[0],),
+    )
+    with torch.inference_mode():
+        for imgs in calibration_imgs:
+            prepared(imgs)
+    return convert_fx(prepared)
+
+
+def check_parity(
+    exported, reference_logits: torch.Tensor, imgs: torch.Tensor, quantized: bool
+) -> Tuple[bool, float]:
+    """
+    Compare an exported net's logits with the eager net's, returning (passed, difference).
+    The difference is the max absolute logit error for float nets, or the fraction of pixels
+    with a different predicted class for int8 nets
+    """
+    with torch.inference_mode():
+        logits = exported(imgs)
+    if quantized:
+        agreement = (logits.argmax(1) == reference_logits.argmax(1)).float().mean()
+        return (agreement.item() >= INT8_PARITY_AGREEMENT, 1 - agreement.item())
+    difference = (logits - reference_logits).abs().max().item()
+    return (difference <= FLOAT_PARITY_ATOL, difference)
+
+
+def export_net(
+    net,
+    dest,
+    sample_imgs: torch.Tensor,
+    calibration_imgs: Optional[Iterable[torch.Tensor]] = None,
+) -> ExportedNet:
+    """
+    Fuse, optionally int8 quantize, and script a trained UNet for cpu inference, saving it to dest.
+    The net is quantized if calibration_imgs are given. sample_imgs and the eager net's logits for them
+    are saved alongside the net so load_exported_net can check it still gives the same results
+    """
+    net = copy.deepcopy(net).cpu().eval()
+    exported = fuse_net(net)
+    quantized = calibration_imgs is not None
+    if quantized:
+        exported = quantize_net(exported, calibration_imgs)
+    scripted = torch.jit.script(exported)
+
+    with torch.inference_mode():
+        reference_logits = net(sample_imgs)
+    passed, difference = check_parity(
+        scripted, reference_logits, sample_imgs, quantized
+    )
+    if not passed:
+        raise Exception(f"Exported net doesn't match the eager net: {difference}")
+
+    info = {
+        "n_channels": net.n_channels,
+        "n_classes": net.n_classes,
+        "quantized": quantized,
+        "quantized_engine": torch.backends.quantized.engine if quantized else None,
+    }
+    parity = io.BytesIO()
+    torch.save({"imgs": sample_imgs, "logits": reference_logits}, parity)
+    torch.jit.save(
+        scripted,
+        str(dest),
+        _extra_files={
+            EXPORT_INFO_FILE: json.dumps(info),
+            PARITY_FILE: parity.getvalue(),
+        },
+    )
+    return ExportedNet(scripted, net.n_channels, net.n_classes, quantized)
+
+
+def load_exported_net(exported_file, check=True) -> ExportedNet:
+    """
+    Load a net saved by export_net. If check is true, it's run on the saved sample images
+    and has to match the eager net's logits for them
+    """
+    extra_files = {EXPORT_INFO_FILE: "", PARITY_FILE: ""}
+    scripted = torch.jit.load(
+        str(exported_file), map_location="cpu", _extra_files=extra_files
+    )
+    info = json.loads(extra_files[EXPORT_INFO_FILE])
+    if info["quantized"]:
+        torch.backends.quantized.engine = info["quantized_engine"]
+    if check:
+        parity = torch.load(io.BytesIO(extra_files[PARITY_FILE]))
+        passed, difference = check_parity(
+            scripted, parity["logits"], parity["imgs"], info["quantized"]
+        )
+        if not passed:
+            raise Exception(
+                f"Exported net {exported_file} doesn't match the eager net: {difference}"
+            )
+    return ExportedNet(
+        scripted, info["n_channels"], info["n_classes"], info["quantized"]
+    ).eval()
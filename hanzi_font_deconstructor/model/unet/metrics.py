@@ -0,0 +1,66 @@
+from typing import Dict, List
+import torch
+
+# what the mask labels from get_labels() mean
+CLASS_NAMES = ["background", "stroke", "overlap"]
+
+
+def get_class_names(n_classes: int) -> List[str]:
+    if n_classes <= len(CLASS_NAMES):
+        return CLASS_NAMES[:n_classes]
+    return CLASS_NAMES + [f"class_{i}" for i in range(len(CLASS_NAMES), n_classes)]
+
+
+class ConfusionMatrix:
+    def __init__(self, n_classes: int, device="cpu"):
+        """
+        Streaming confusion matrix of true class (rows) vs predicted class (columns) over every pixel,
+        kept on the device so updating it never waits on the device. compute() syncs once at the end.
+        A 1-class net is treated as 2 classes, background and stroke.
+        True classes the net doesn't have are counted as its last class, so overlaps count as strokes
+        for a net which only predicts background and stroke
+        """
+        self.n_classes = max(n_classes, 2)
+        self.matrix = torch.zeros(
+            (self.n_classes, self.n_classes), dtype=torch.int64, device=device
+        )
+
+    def update(self, logits, target):
+        "add a batch of the net's (N, C, H, W) logits against the (N, H, W) true classes"
+        if logits.shape[1] == 1:
+            pred = (logits[:, 0] > 0).long()
+        else:
+            pred = logits.argmax(1)
+        # clamped on the device, checking the labels here would sync every update
+        target = target.long().clamp(max=self.n_classes - 1)
+        index = target.reshape(-1) * self.n_classes + pred.reshape(-1)
+        self.matrix += torch.bincount(
+            index, minlength=self.n_classes * self.n_classes
+        ).reshape(self.n_classes, self.n_classes)
+
+    def compute(self) -> Dict[str, Dict[str, float]]:
+        """
+        per-class iou, precision, recall and dice, as {metric: {class name: value}}, plus overall accuracy
+        and mean iou under "summary". Classes that never occur nor get predicted are nan
+        """
+        matrix = self.matrix.double().cpu()
+        true_positives = matrix.diag()
+        predicted = matrix.sum(0)
+        actual = matrix.sum(1)
+        errors = (predicted - true_positives) + (actual - true_positives)
+        class_metrics = {
+            "iou": true_positives / (true_positives + errors),
+            "precision": true_positives / predicted,
+            "recall": true_positives / actual,
+            "dice": 2 * true_positives / (2 * true_positives + errors),
+        }
+        names = get_class_names(self.n_classes)
+        metrics = {
+            metric: dict(zip(names, values.tolist()))
+            for metric, values in class_metrics.items()
+        }
+        metrics["summary"] = {
+            "accuracy": (true_positives.sum() / matrix.sum()).item(),
+            "mean_iou": class_metrics["iou"].nanmean().item(),
+        }
+        return metrics
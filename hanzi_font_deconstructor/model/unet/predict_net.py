@@ -0,0 +1,115 @@
+from typing import Iterator, List, Optional, Tuple
+import torch
+import torch.nn.functional as F
+from hanzi_font_deconstructor.common.batches import images_to_device
+
+# rough peak memory used by a UNet forward pass under inference mode, per input pixel of each image.
+# Measured on cpu at 256px and 512px, with some headroom
+INFERENCE_BYTES_PER_PIXEL = 3072
+# the UNet downsamples 4 times, so tiles are kept to multiples of 16 to avoid padding inside the net
+TILE_MULTIPLE = 16
+
+
+def get_max_tile_size(memory_budget: int, batch_size=1) -> int:
+    "the largest square tile that a batch can be run on within memory_budget bytes"
+    max_pixels = memory_budget / (INFERENCE_BYTES_PER_PIXEL * batch_size)
+    tile_size = int(max_pixels ** 0.5) // TILE_MULTIPLE * TILE_MULTIPLE
+    if tile_size < TILE_MULTIPLE:
+        raise Exception(
+            f"A memory budget of {memory_budget} bytes is too small to run a batch of {batch_size}"
+        )
+    return tile_size
+
+
+def get_tile_starts(size: int, tile_size: int, overlap: int) -> List[int]:
+    "start positions of tiles covering size pixels, with the last tile ending flush with the edge"
+    if size <= tile_size:
+        return [0]
+    stride = tile_size - overlap
+    starts = list(range(0, size - tile_size, stride))
+    return starts + [size - tile_size]
+
+
+def get_blend_window(tile_size: int, overlap: int, device) -> torch.Tensor:
+    """
+    (tile_size, tile_size) weights for blending overlapping tiles, ramping up linearly across the overlap
+    so seams fade from one tile into the next. Weights never reach 0, so pixels only covered by
+    the edge of a single tile keep that tile's prediction
+    """
+    ramp = torch.ones(tile_size, device=device)
+    if overlap > 0:
+        edge = (torch.arange(overlap, device=device) + 0.5) / overlap
+        ramp[:overlap] = torch.minimum(ramp[:overlap], edge)
+        ramp[-overlap:] = torch.minimum(ramp[-overlap:], edge.flip(0))
+    return ramp.unsqueeze(1) * ramp.unsqueeze(0)
+
+
+def predict_logits_tiled(net, imgs: torch.Tensor, tile_size: int, overlap=32):
+    """
+    Run the net over (N, C, H, W) imgs in overlapping tile_size x tile_size tiles, so peak memory
+    depends on the tile size rather than the image size. Logits from overlapping tiles are blended together
+    """
+    if overlap >= tile_size:
+        raise Exception(f"Tile overlap {overlap} must be smaller than the tiles")
+    n, _, height, width = imgs.shape
+    if height <= tile_size and width <= tile_size:
+        return net(imgs)
+    tile_h = min(tile_size, height)
+    tile_w = min(tile_size, width)
+    window = get_blend_window(tile_size, overlap, imgs.device)[:tile_h, :tile_w]
+    logits = None
+    weights = torch.zeros((height, width), device=imgs.device)
+    for y in get_tile_starts(height, tile_size, overlap):
+        for x in get_tile_starts(width, tile_size, overlap):
+            tile_logits = net(imgs[:, :, y : y + tile_h, x : x + tile_w])
+            if logits is None:
+                logits = torch.zeros(
+                    (n, tile_logits.shape[1], height, width),
+                    dtype=tile_logits.dtype,
+                    device=imgs.device,
+                )
+            logits[:, :, y : y + tile_h, x : x + tile_w] += tile_logits * window
+            weights[y : y + tile_h, x : x + tile_w] += window
+    return logits / weights
+
+
+def predict_logits(
+    net, imgs: torch.Tensor, tile_size: Optional[int] = None, overlap=32, scale=1.0
+):
+    """
+    Run the net over (N, C, H, W) imgs, returning (N, n_classes, H, W) logits.
+    If scale is below 1, the net is run on downscaled imgs and the logits are upsampled back to full size.
+    If tile_size is given, the net is run on tiles of at most that size
+    """
+    height, width = imgs.shape[2:]
+    if scale != 1:
+        imgs = F.interpolate(imgs, scale_factor=scale, mode="area")
+    if tile_size is None:
+        logits = net(imgs)
+    else:
+        logits = predict_logits_tiled(net, imgs, tile_size, overlap)
+    if scale != 1:
+        logits = F.interpolate(
+            logits, size=(height, width), mode="bilinear", align_corners=False
+        )
+    return logits
+
+
+def predict_masks(
+    net, loader, device, tile_size: Optional[int] = None, overlap=32, scale=1.0
+) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+    """
+    Run the net over every batch from a GlyphDataset loader, yielding (codepoints, masks) for each batch.
+    masks are (N, H, W) uint8 tensors on the cpu holding the predicted class of each pixel.
+    tile_size, overlap and scale are passed on to predict_logits
+    """
+    net.eval()
+    with torch.inference_mode():
+        for batch in loader:
+            imgs = images_to_device(batch["image"], device)
+            masks_pred = predict_logits(net, imgs, tile_size, overlap, scale)
+            if net.n_classes > 1:
+                masks = masks_pred.argmax(1)
+            else:
+                masks = torch.sigmoid(masks_pred).squeeze(1) > 0.5
+            yield (batch["codepoint"], masks.to(torch.uint8).cpu())
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import torch
+
+STATS = ["norm", "min", "max", "mean"]
+
+
+@dataclass
+class TelemetryPolicy:
+    "what train_net logs about the net's weights and gradients each time it evaluates"
+
+    # norm, min, max and mean of every weight and gradient tensor, which are cheap
+    param_stats: bool = True
+    # full histograms every this many evaluations, 0 for never
+    histogram_every: int = 10
+    # build and write the histograms on a background thread
+    async_histograms: bool = True
+
+
+def get_tensor_stats(tensors: List[torch.Tensor]) -> torch.Tensor:
+    """
+    (len(tensors), len(STATS)) table of stats for the tensors. Each stat is a separate reduction
+    over each tensor, but they all stay on the device and are stacked so reading them back costs one sync
+    """
+    tensors = [tensor.detach().float() for tensor in tensors]
+    return torch.stack(
+        [
+            torch.stack([torch.linalg.vector_norm(tensor) for tensor in tensors]),
+            torch.stack([tensor.amin() for tensor in tensors]),
+            torch.stack([tensor.amax() for tensor in tensors]),
+            torch.stack([tensor.mean() for tensor in tensors]),
+        ],
+        dim=1,
+    )
+
+
+def get_parameter_stats(net) -> Dict[str, float]:
+    "stats of every weight and gradient in the net, tagged like weights/<param>/<stat>"
+    named_tensors = []
+    for name, param in net.named_parameters():
+        tag = name.replace(".", "/")
+        named_tensors.append((f"weights/{tag}", param))
+        if param.grad is not None:
+            named_tensors.append((f"grads/{tag}", param.grad))
+    table = get_tensor_stats([tensor for _, tensor in named_tensors]).tolist()
+    return {
+        f"{tag}/{stat}": value
+        for (tag, _), row in zip(named_tensors, table)
+        for stat, value in zip(STATS, row)
+    }
+
+
+class TelemetryLogger:
+    def __init__(self, writer, policy: Optional[TelemetryPolicy] = None):
+        """
+        Logs the net's weights and gradients to a SummaryWriter following the policy.
+        Call log_parameters() at each evaluation and close() when training is done
+        """
+        self.writer = writer
+        self.policy = policy = policy or TelemetryPolicy()
+        self.evals = 0
+        self.executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="telemetry")
+            if policy.async_histograms
+            else None
+        )
+        self.pending = []
+
+    def log_parameters(self, net, global_step: int):
+        if self.policy.param_stats:
+            for tag, value in get_parameter_stats(net).items():
+                self.writer.add_scalar(tag, value, global_step)
+        every = self.policy.histogram_every
+        if every and self.evals % every == 0:
+            self.log_histograms(net, global_step)
+        self.evals += 1
+
+    def log_histograms(self, net, global_step: int):
+        tensors = {}
+        for name, param in net.named_parameters():
+            tag = name.replace(".", "/")
+            # copied, so training can carry on updating them while the histograms are built
+            tensors[f"weights/{tag}"] = param.detach().to("cpu", copy=True)
+            if param.grad is not None:
+                tensors[f"grads/{tag}"] = param.grad.detach().to("cpu", copy=True)
+        if self.executor:
+            self.pending = [future for future in self.pending if not future.done()]
+            self.pending.append(
+                self.executor.submit(self.write_histograms, tensors, global_step)
+            )
+        else:
+            self.write_histograms(tensors, global_step)
+
+    def write_histograms(self, tensors: Dict[str, torch.Tensor], global_step: int):
+        for tag, tensor in tensors.items():
+            self.writer.add_histogram(tag, tensor.float().numpy(), global_step)
+
+    def close(self):
+        "wait for the histograms still being written, raising any error writing them"
+        for future in self.pending:
+            future.result()
+        self.pending = []
+        if self.executor:
+            self.executor.shutdown()
@@ -1,18 +1,86 @@
 # from https://github.com/milesial/Pytorch-UNet
 
 import logging
+import math
 import os
+import random
+import time
 from tqdm import tqdm
 import torch
 import torch.nn as nn
 from torch import optim
-from .RandomStrokeMasksDataset import RandomStrokeMasksDataset
+from .IndexedStrokeMasksDataset import IndexedStrokeMasksDataset
+from .ShardedStrokeMasksDataset import ShardedStrokeMasksDataset
+from .ValidationSet import ValidationSet
+from .telemetry import TelemetryLogger
 from .eval_net import eval_net
+from .dice_loss import DiceLoss
+from .metrics import CLASS_NAMES, ConfusionMatrix
+from .checkpoints import (
+    LATEST_CHECKPOINT,
+    CheckpointWriter,
+    OffsetSampler,
+    get_training_state,
+    load_checkpoint,
+    restore_training_state,
+    to_cpu,
+)
+from hanzi_font_deconstructor.common.batches import (
+    collate_uint8,
+    images_to_device,
+    masks_to_device,
+)
+from hanzi_font_deconstructor.common.instrumentation import COUNTERS, SharedStats
 
 from torch.utils.tensorboard import SummaryWriter
 from torch.utils.data import DataLoader
 
 
+def log_data_stats(writer, totals, logged_totals, wait_time, step_time, global_step):
+    """
+    Log what the training data generator has done since the last log, and how long training spent waiting on it.
+    A high data/wait_fraction means the net is starved by data generation, and the stage fractions show why.
+    Returns the totals to pass in as logged_totals next time
+    """
+    delta = {name: totals[name] - logged_totals[name] for name in totals}
+    if wait_time + step_time > 0:
+        writer.add_scalar(
+            "data/wait_fraction", wait_time / (wait_time + step_time), global_step
+        )
+    for name in COUNTERS:
+        writer.add_scalar(f"data/{name}", delta[name], global_step)
+    if delta["candidates"] > 0:
+        writer.add_scalar(
+            "data/acceptance_rate",
+            delta["accepted"] / delta["candidates"],
+            global_step,
+        )
+    sample_time = delta["time/sample"]
+    if sample_time > 0:
+        writer.add_scalar(
+            "data/ms_per_sample", 1000 * sample_time / delta["samples"], global_step
+        )
+        for name, value in delta.items():
+            if name.startswith("time/") and name != "time/sample":
+                writer.add_scalar(
+                    f"data/stage_fraction/{name[len('time/'):]}",
+                    value / sample_time,
+                    global_step,
+                )
+    return totals
+
+
+def log_class_metrics(writer, metrics, global_step):
+    "log the per-class validation metrics from ConfusionMatrix.compute() under val/"
+    for metric, values in metrics.items():
+        for name, value in values.items():
+            writer.add_scalar(f"val/{metric}/{name}", value, global_step)
+    logging.info(
+        "Validation IoU: "
+        + ", ".join(f"{name} {value:.4f}" for name, value in metrics["iou"].items())
+    )
+
+
 def train_net(
     net,
     device,
@@ -24,35 +92,94 @@ def train_net(
     val_portion=0.1,
     save_cp_dir=None,
     num_workers=2,
+    seed=None,
+    resume_from=None,
+    checkpoint_every=None,
+    accumulation_steps=1,
+    bf16=False,
+    channels_last=False,
+    val_batch_size=None,
+    val_samples_per_eval=None,
+    eval_interval=None,
+    val_cache=None,
+    telemetry=None,
+    dice_weight=0.0,
+    train_shards=None,
 ):
+    """
+    Train the net on freshly generated samples. If save_cp_dir is given, the net's weights are saved there
+    after every epoch, along with the full training state in CP_latest.pth, which is also saved every
+    checkpoint_every steps. Pass a full training state as resume_from to pick up where it left off.
+    Each optimizer step accumulates gradients over accumulation_steps batches, emulating a bigger batch.
+    bf16 runs the forward pass under bfloat16 autocast, which CPUs with AVX-512 BF16 or AMX run much faster,
+    and channels_last keeps activations in NHWC, which the CPU convolution kernels prefer.
+    The validation samples are generated once, or loaded from the val_cache file if it has the same ones,
+    and evaluated in batches of val_batch_size (4 training batches by default). By default the net is evaluated
+    ten times an epoch on all of them. val_samples_per_eval evaluates on just that many of them instead,
+    and eval_interval evaluates every that many seconds.
+    What's logged about the weights and gradients at each evaluation follows the telemetry policy, a TelemetryPolicy.
+    dice_weight adds that much of a soft Dice loss to the cross entropy loss.
+    To reuse samples across runs, pass a directory of shards from create_training_data.py --format shards
+    as train_shards. Every sample in them is trained on each epoch, at the shards' size, and val_portion
+    of the total is generated for validation
+    """
 
-    n_val = int(total_samples * val_portion)
-    n_train = total_samples - n_val
+    # callers may pass a device name like "cuda"
+    device = torch.device(device)
+    data_stats = SharedStats(num_workers)
+    if train_shards:
+        train_dataset = ShardedStrokeMasksDataset(train_shards)
+        n_train = len(train_dataset)
+        n_val = round(n_train * val_portion / (1 - val_portion))
+        size_px = train_dataset.size_px
+        # only seeds the validation samples, the training samples are fixed by the shards
+        data_seed = seed if seed is not None else random.randrange(2 ** 32)
+    else:
+        n_val = int(total_samples * val_portion)
+        n_train = total_samples - n_val
+        train_dataset = IndexedStrokeMasksDataset(
+            n_train, size_px=size_px, seed=seed, stats=data_stats
+        )
+        data_seed = train_dataset.seed
+    pin_memory = device.type == "cuda"
+    # resuming starts partway through an epoch
+    train_sampler = OffsetSampler(n_train)
     train_loader = DataLoader(
-        RandomStrokeMasksDataset(n_train, size_px=size_px, static=False),
-        batch_size=batch_size,
-        num_workers=num_workers,
-    )
-    val_loader = DataLoader(
-        RandomStrokeMasksDataset(n_val, size_px=size_px, static=True),
+        train_dataset,
+        sampler=train_sampler,
         batch_size=batch_size,
         num_workers=num_workers,
+        collate_fn=collate_uint8,
+        pin_memory=pin_memory,
     )
 
     writer = SummaryWriter(comment=f"LR_{lr}_BS_{batch_size}")
+    telemetry_logger = TelemetryLogger(writer, telemetry)
     global_step = 0
+    logged_data_stats = data_stats.totals()
+    # time spent waiting on the train loader vs everything else, since the last log
+    data_wait_time = 0.0
+    step_time = 0.0
 
     logging.info(
         f"""Starting training:
         Epochs:          {epochs}
-        Batch size:      {batch_size}
+        Batch size:      {batch_size} x {accumulation_steps} accumulation steps
         Learning rate:   {lr}
         Training size:   {n_train}
         Validation size: {n_val}
         Device:          {device.type}
+        bfloat16:        {bf16}
+        Channels last:   {channels_last}
     """
     )
 
+    if net.n_classes > len(CLASS_NAMES):
+        logging.warning(
+            f"The net has {net.n_classes} classes, but the masks only have {len(CLASS_NAMES)}: "
+            f"{', '.join(CLASS_NAMES)}. The extra classes never occur"
+        )
+
     optimizer = optim.RMSprop(net.parameters(), lr=lr, weight_decay=1e-8, momentum=0.9)
     scheduler = optim.lr_scheduler.ReduceLROnPlateau(
         optimizer, "min" if net.n_classes > 1 else "max", patience=2
@@ -61,79 +188,214 @@ def train_net(
         criterion = nn.CrossEntropyLoss()
     else:
         criterion = nn.BCEWithLogitsLoss()
+    dice_loss = DiceLoss() if dice_weight else None
 
-    for epoch in range(epochs):
-        net.train()
-
-        epoch_loss = 0
-        with tqdm(
-            total=n_train, desc=f"Epoch {epoch + 1}/{epochs}", unit="img"
-        ) as pbar:
-            for batch in train_loader:
-                imgs = batch["image"]
-                true_masks = batch["mask"]
-                assert imgs.shape[1] == net.n_channels, (
-                    f"Network has been defined with {net.n_channels} input channels, "
-                    f"but loaded images have {imgs.shape[1]} channels. Please check that "
-                    "the images are loaded correctly."
-                )
+    if channels_last:
+        net.to(memory_format=torch.channels_last)
 
-                imgs = imgs.to(device=device, dtype=torch.float32)
-                mask_type = torch.float32 if net.n_classes == 1 else torch.long
-                true_masks = true_masks.to(device=device, dtype=mask_type)
-
-                masks_pred = net(imgs)
-                loss = criterion(masks_pred, true_masks)
-                epoch_loss += loss.item()
-                writer.add_scalar("Loss/train", loss.item(), global_step)
-
-                pbar.set_postfix(**{"loss (batch)": loss.item()})
-
-                optimizer.zero_grad()
-                loss.backward()
-                nn.utils.clip_grad_value_(net.parameters(), 0.1)
-                optimizer.step()
-
-                pbar.update(imgs.shape[0])
-                global_step += 1
-                if global_step % (n_train // (10 * batch_size)) == 0:
-                    for tag, value in net.named_parameters():
-                        tag = tag.replace(".", "/")
-                        writer.add_histogram(
-                            "weights/" + tag, value.data.cpu().numpy(), global_step
-                        )
-                        writer.add_histogram(
-                            "grads/" + tag, value.grad.data.cpu().numpy(), global_step
-                        )
-                    val_score = eval_net(net, val_loader, device)
-                    scheduler.step(val_score)
-                    writer.add_scalar(
-                        "learning_rate", optimizer.param_groups[0]["lr"], global_step
+    steps_per_epoch = math.ceil(n_train / batch_size)
+    eval_every = max(1, n_train // (10 * batch_size * accumulation_steps))
+    # a resumed run has to use the same ones, for the samples, steps and eval cadence to line up
+    resume_settings = {
+        "n_train": n_train,
+        "train_shards": str(train_shards) if train_shards else None,
+        "size_px": size_px,
+        "batch_size": batch_size,
+        "accumulation_steps": accumulation_steps,
+    }
+    start_epoch = 0
+    # batches of the current epoch that are done, global_step counts optimizer steps
+    epoch_step = 0
+    if resume_from:
+        checkpoint = load_checkpoint(resume_from, device)
+        restore_training_state(
+            checkpoint, net, optimizer, scheduler, settings=resume_settings
+        )
+        start_epoch = checkpoint["epoch"]
+        epoch_step = checkpoint["epoch_samples"] // batch_size
+        global_step = checkpoint["global_step"]
+        # the same seed regenerates the same samples, so the run carries on exactly where it stopped
+        data_seed = checkpoint["seed"]
+        if not train_shards:
+            train_dataset.seed = data_seed
+        logging.info(
+            f"Resuming from {resume_from} at epoch {start_epoch + 1}, step {global_step}"
+        )
+
+    # generated after resuming, since the validation samples depend on the training seed
+    val_options = dict(
+        total_samples=n_val,
+        size_px=size_px,
+        seed=f"{data_seed}-validation",
+        num_workers=num_workers,
+        batch_size=val_batch_size or 4 * batch_size,
+    )
+    if val_cache:
+        val_set = ValidationSet.load_or_generate(val_cache, **val_options)
+    else:
+        val_set = ValidationSet.generate(**val_options)
+    if pin_memory:
+        val_set = val_set.pin_memory()
+    eval_set = val_set.subset(val_samples_per_eval)
+    last_eval = time.perf_counter()
+
+    checkpoint_writer = None
+    if save_cp_dir:
+        os.makedirs(save_cp_dir, exist_ok=True)
+        checkpoint_writer = CheckpointWriter()
+
+    def save_training_state(epoch):
+        checkpoint_writer.write(
+            get_training_state(
+                net,
+                optimizer,
+                scheduler,
+                epoch,
+                epoch_step * batch_size,
+                global_step,
+                data_seed,
+                resume_settings,
+            ),
+            os.path.join(save_cp_dir, LATEST_CHECKPOINT),
+        )
+
+    # flush queued checkpoints even if training dies, that's when they're needed most
+    try:
+        for epoch in range(start_epoch, epochs):
+            net.train()
+            train_dataset.set_epoch(epoch)
+            train_sampler.start = epoch_step * batch_size
+
+            epoch_loss = 0
+            accumulated_loss = 0.0
+            with tqdm(
+                total=n_train,
+                initial=train_sampler.start,
+                desc=f"Epoch {epoch + 1}/{epochs}",
+                unit="img",
+            ) as pbar:
+                batch_requested = time.perf_counter()
+                for batch in train_loader:
+                    batch_received = time.perf_counter()
+                    data_wait_time += batch_received - batch_requested
+                    imgs = batch["image"]
+                    true_masks = batch["mask"]
+                    assert imgs.shape[1] == net.n_channels, (
+                        f"Network has been defined with {net.n_channels} input channels, "
+                        f"but loaded images have {imgs.shape[1]} channels. Please check that "
+                        "the images are loaded correctly."
                     )
 
-                    if net.n_classes > 1:
-                        logging.info("Validation cross entropy: {}".format(val_score))
-                        writer.add_scalar("Loss/test", val_score, global_step)
+                    imgs = images_to_device(imgs, device)
+                    if channels_last:
+                        imgs = imgs.contiguous(memory_format=torch.channels_last)
+                    mask_type = torch.float32 if net.n_classes == 1 else torch.long
+                    true_masks = masks_to_device(true_masks, device, mask_type)
+
+                    if epoch_step % accumulation_steps == 0:
+                        optimizer.zero_grad()
+                    with torch.autocast(
+                        device.type, dtype=torch.bfloat16, enabled=bf16
+                    ):
+                        masks_pred = net(imgs)
+                        loss = criterion(masks_pred, true_masks)
+                        if dice_loss is not None:
+                            loss = loss + dice_weight * dice_loss(
+                                masks_pred, true_masks
+                            )
+                    # the gradients of the accumulated batches add up to the gradient of their mean loss
+                    (loss / accumulation_steps).backward()
+                    batch_loss = loss.item()
+                    epoch_loss += batch_loss
+                    accumulated_loss += batch_loss
+
+                    pbar.set_postfix(**{"loss (batch)": batch_loss})
+                    pbar.update(imgs.shape[0])
+                    epoch_step += 1
+
+                    stepped = (
+                        epoch_step % accumulation_steps == 0
+                        or epoch_step == steps_per_epoch
+                    )
+                    if stepped:
+                        nn.utils.clip_grad_value_(net.parameters(), 0.1)
+                        optimizer.step()
+                        accumulated_batches = (epoch_step - 1) % accumulation_steps + 1
+                        writer.add_scalar(
+                            "Loss/train",
+                            accumulated_loss / accumulated_batches,
+                            global_step,
+                        )
+                        accumulated_loss = 0.0
+                        global_step += 1
+                    step_time += time.perf_counter() - batch_received
+                    if eval_interval:
+                        eval_due = time.perf_counter() - last_eval >= eval_interval
                     else:
-                        logging.info("Validation Dice Coeff: {}".format(val_score))
-                        writer.add_scalar("Dice/test", val_score, global_step)
-
-                    writer.add_images("images", imgs, global_step)
-                    if net.n_classes == 1:
-                        writer.add_images("masks/true", true_masks, global_step)
-                        writer.add_images(
-                            "masks/pred", torch.sigmoid(masks_pred) > 0.5, global_step
+                        eval_due = global_step % eval_every == 0
+                    if stepped and eval_due:
+                        logged_data_stats = log_data_stats(
+                            writer,
+                            data_stats.totals(),
+                            logged_data_stats,
+                            data_wait_time,
+                            step_time,
+                            global_step,
+                        )
+                        data_wait_time = 0.0
+                        step_time = 0.0
+                        telemetry_logger.log_parameters(net, global_step)
+                        confusion_matrix = ConfusionMatrix(net.n_classes, device)
+                        val_score = eval_net(net, eval_set, device, confusion_matrix)
+                        last_eval = time.perf_counter()
+                        log_class_metrics(
+                            writer, confusion_matrix.compute(), global_step
                         )
+                        scheduler.step(val_score)
+                        writer.add_scalar(
+                            "learning_rate",
+                            optimizer.param_groups[0]["lr"],
+                            global_step,
+                        )
+
+                        if net.n_classes > 1:
+                            logging.info(
+                                "Validation cross entropy: {}".format(val_score)
+                            )
+                            writer.add_scalar("Loss/test", val_score, global_step)
+                        else:
+                            logging.info("Validation Dice Coeff: {}".format(val_score))
+                            writer.add_scalar("Dice/test", val_score, global_step)
 
-        if save_cp_dir:
-            try:
-                os.mkdir(save_cp_dir)
-                logging.info("Created checkpoint directory")
-            except OSError:
-                pass
-            torch.save(
-                net.state_dict(), os.path.join(save_cp_dir, f"CP_epoch{epoch + 1}.pth")
-            )
-            logging.info(f"Checkpoint {epoch + 1} saved !")
-
-    writer.close()
+                        writer.add_images("images", imgs, global_step)
+                        if net.n_classes == 1:
+                            writer.add_images("masks/true", true_masks, global_step)
+                            writer.add_images(
+                                "masks/pred",
+                                torch.sigmoid(masks_pred) > 0.5,
+                                global_step,
+                            )
+                    if (
+                        stepped
+                        and checkpoint_writer
+                        and checkpoint_every
+                        and global_step % checkpoint_every == 0
+                    ):
+                        save_training_state(epoch)
+                    # validation and checkpoint time doesn't count as waiting for data
+                    batch_requested = time.perf_counter()
+
+            epoch_step = 0
+            if checkpoint_writer:
+                checkpoint_writer.write(
+                    to_cpu(net.state_dict()),
+                    os.path.join(save_cp_dir, f"CP_epoch{epoch + 1}.pth"),
+                )
+                save_training_state(epoch + 1)
+                logging.info(f"Checkpoint {epoch + 1} saved !")
+    finally:
+        if checkpoint_writer:
+            checkpoint_writer.close()
+        # before the writer, since its pending histograms are written through it
+        telemetry_logger.close()
+        writer.close()
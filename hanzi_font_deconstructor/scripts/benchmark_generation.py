@@ -0,0 +1,162 @@
+from collections import defaultdict
+from hanzi_font_deconstructor.common import instrumentation
+from hanzi_font_deconstructor.common.generate_training_data import (
+    generate_sample,
+    get_stroke_tables,
+)
+from multiprocessing import Pool
+from typing import Dict, List
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import torch
+
+
+def generate_samples(task) -> Dict[str, float]:
+    "generate samples [start, end), returning the instrumentation metrics for them"
+    start, end, seed, size_px, composite, max_strokes = task
+    instrumentation.enable()
+    instrumentation.reset()
+    for i in range(start, end):
+        generate_sample(
+            i, seed, size_px=size_px, composite=composite, max_strokes=max_strokes
+        )
+    return instrumentation.snapshot()
+
+
+def run_benchmark(
+    size_px: int,
+    workers: int,
+    samples: int,
+    seed=0,
+    composite=True,
+    max_strokes=4,
+    chunk_size=10,
+) -> dict:
+    """
+    Time generating samples at this size with this many worker processes.
+    Stage times are summed over all workers, and reported as a fraction of the total time spent generating samples
+    """
+    tasks = [
+        (start, min(start + chunk_size, samples), seed, size_px, composite, max_strokes)
+        for start in range(0, samples, chunk_size)
+    ]
+    start = time.perf_counter()
+    if workers <= 1:
+        results = [generate_samples(task) for task in tasks]
+    else:
+        # DataLoader workers run torch single threaded too
+        with Pool(workers, initializer=torch.set_num_threads, initargs=(1,)) as pool:
+            results = pool.map(generate_samples, tasks)
+    elapsed = time.perf_counter() - start
+
+    metrics = defaultdict(float)
+    for task_metrics in results:
+        for name, value in task_metrics.items():
+            metrics[name] += value
+    sample_time = metrics["time/sample"]
+    stages = {
+        stage: metrics[f"time/{stage}"] / sample_time
+        for stage in instrumentation.STAGES
+        if stage != "sample"
+    }
+    stages["other"] = max(0, 1 - sum(stages.values()))
+    return {
+        "size_px": size_px,
+        "workers": workers,
+        "samples": samples,
+        "composite": composite,
+        "seconds": elapsed,
+        "samples_per_sec": samples / elapsed,
+        "stage_fractions": stages,
+        "counts": {name: int(metrics[name]) for name in instrumentation.COUNTERS},
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(results: List[dict], baseline: List[dict]):
+    baseline_rates = {
+        (result["size_px"], result["workers"]): result["samples_per_sec"]
+        for result in baseline
+    }
+    for result in results:
+        key = (result["size_px"], result["workers"])
+        if key in baseline_rates:
+            speedup = result["samples_per_sec"] / baseline_rates[key]
+            print(f"size_px={key[0]} workers={key[1]}: {speedup:.2f}x the baseline")
+
+
+parser = argparse.ArgumentParser(
+    description="Measure how fast training samples are generated, and where the time goes"
+)
+parser.add_argument("--sizes", default=[256, 512], type=int, nargs="+")
+parser.add_argument(
+    "--workers", default=sorted({1, os.cpu_count()}), type=int, nargs="+"
+)
+parser.add_argument("--samples", default=200, type=int)
+parser.add_argument("--max-strokes", default=4, type=int)
+parser.add_argument(
+    "--svg",
+    action="store_true",
+    help="render the input image from the svg, instead of compositing the stroke alphas",
+)
+parser.add_argument("--seed", default=0, type=int)
+parser.add_argument(
+    "--output", default=None, help="write the results to this json file"
+)
+parser.add_argument(
+    "--compare", default=None, help="a json file from a previous run to compare against"
+)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    # build the stroke tables before timing or forking, like training does
+    get_stroke_tables()
+    results = []
+    for size_px in args.sizes:
+        for workers in args.workers:
+            result = run_benchmark(
+                size_px,
+                workers,
+                args.samples,
+                seed=args.seed,
+                composite=not args.svg,
+                max_strokes=args.max_strokes,
+            )
+            results.append(result)
+            stages = ", ".join(
+                f"{stage} {fraction:.0%}"
+                for stage, fraction in result["stage_fractions"].items()
+                if fraction > 0
+            )
+            print(
+                f"size_px={size_px} workers={workers}: {result['samples_per_sec']:.1f} samples/sec ({stages})"
+            )
+
+    report = {
+        "commit": get_git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            compare_results(results, json.load(baseline_file)["results"])
@@ -0,0 +1,59 @@
+from statistics import median
+import argparse
+import subprocess
+import sys
+
+# each measurement runs in a fresh interpreter, so nothing is already imported or cached
+TIMING_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module} as module
+imported = time.perf_counter()
+{first_use}
+used = time.perf_counter()
+print(imported - start, used - imported)
+"""
+
+FIRST_USE = "module.get_stroke_tables()"
+
+
+parser = argparse.ArgumentParser(
+    description="Measure how long it takes to import the training data generator, and to build its stroke tables on first use"
+)
+parser.add_argument(
+    "--module", default="hanzi_font_deconstructor.common.generate_training_data"
+)
+parser.add_argument("--repeat", default=10, type=int)
+parser.add_argument(
+    "--baseline",
+    default=None,
+    help="import this module first and subtract its import time, e.g. torch, to measure just this package",
+)
+
+
+def time_import(module: str, first_use: str):
+    "return (import seconds, first use seconds) from a fresh interpreter"
+    script = TIMING_SCRIPT.format(module=module, first_use=first_use)
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    import_time, first_use_time = output.split()
+    return (float(import_time), float(first_use_time))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    import_times = []
+    first_use_times = []
+    for _ in range(args.repeat):
+        import_time, first_use_time = time_import(args.module, FIRST_USE)
+        if args.baseline:
+            import_time -= time_import(args.baseline, "")[0]
+        import_times.append(import_time)
+        first_use_times.append(first_use_time)
+    print(
+        f"import {args.module}: {median(import_times) * 1000:.1f}ms (median of {args.repeat})"
+    )
+    print(
+        f"build stroke tables: {median(first_use_times) * 1000:.1f}ms (median of {args.repeat})"
+    )
@@ -1,40 +1,140 @@
-from dataclasses import asdict
 from hanzi_font_deconstructor.common.generate_training_data import (
-    STROKE_VIEW_BOX,
     get_training_input_svg_and_masks,
+    get_sample_rng,
+    generate_sample,
 )
+from hanzi_font_deconstructor.common.shards import (
+    image_to_uint8,
+    write_shard,
+    write_shard_index,
+)
+from multiprocessing import Pool
 from os import path, makedirs
 from pathlib import Path
+from tqdm import tqdm
+import numpy as np
 import shutil
 import argparse
+import json
+import random
 
 PROJECT_ROOT = Path(__file__).parents[2]
 DEST_FOLDER = PROJECT_ROOT / "data"
 
+# number of sample svgs each task writes, shards are written one shard per task
+SVG_CHUNK_SIZE = 100
+
 
 parser = argparse.ArgumentParser(
     description="Generate training data for a model to deconstruct hanzi into strokes"
 )
-parser.add_argument("--max-strokes-per-img", default=5, type=int)
+parser.add_argument("--max-strokes-per-img", default=4, type=int)
 parser.add_argument("--total-images", default=50, type=int)
-args = parser.parse_args()
+parser.add_argument(
+    "--format",
+    default="svg",
+    choices=["svg", "shards"],
+    help="svg writes a sample svg per image, shards writes (image, mask) pairs into uint8 shards for training",
+)
+parser.add_argument("--size-px", default=512, type=int)
+parser.add_argument("--shard-size", default=1000, type=int)
+parser.add_argument(
+    "--workers", default=1, type=int, help="number of processes generating samples"
+)
+parser.add_argument(
+    "--seed",
+    default=None,
+    type=int,
+    help="sample i is always the same for a given seed, no matter how many workers are used",
+)
+
+
+def create_sample_svgs(task):
+    "write the sample svgs for indices [start, end), returning the filenames written"
+    start, end, seed, max_strokes = task
+    filenames = []
+    for i in range(start, end):
+        (img_svg, stroke_masks) = get_training_input_svg_and_masks(
+            256, max_strokes, rng=get_sample_rng(seed, i)
+        )
+        filename = f"{i}-{len(stroke_masks)}.svg"
+        with open(DEST_FOLDER / "sample_svgs" / filename, "w") as img_file:
+            img_file.write(img_svg)
+        filenames.append(filename)
+    return filenames
+
+
+def create_shard(task):
+    "write a single shard holding samples [start, end), returning its index entry"
+    start, end, seed, max_strokes, size_px, shard_size = task
+    images = np.zeros((end - start, size_px, size_px), dtype=np.uint8)
+    masks = np.zeros((end - start, size_px, size_px), dtype=np.uint8)
+    for i in range(start, end):
+        input, mask = generate_sample(i, seed, size_px=size_px, max_strokes=max_strokes)
+        images[i - start] = image_to_uint8(input)
+        masks[i - start] = mask.numpy()
+    name = f"shard-{start // shard_size:05d}"
+    return write_shard(DEST_FOLDER / "shards", name, images, masks)
+
+
+def run_tasks(task_fn, tasks, workers):
+    "run the tasks, in worker processes if there's more than one worker, yielding (task, result) as they finish"
+    if workers <= 1:
+        for task in tasks:
+            yield (task, task_fn(task))
+        return
+    with Pool(workers) as pool:
+        yield from zip(tasks, pool.imap(task_fn, tasks))
+
 
 if __name__ == "__main__":
+    args = parser.parse_args()
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+
     # create and empty the dest folder
     if path.exists(DEST_FOLDER):
         shutil.rmtree(DEST_FOLDER)
     makedirs(DEST_FOLDER)
-    makedirs(DEST_FOLDER / "sample_svgs")
 
-    # create the data
-    data = {
-        "viewbox": STROKE_VIEW_BOX,
-        "imgs": [],
+    manifest = {
+        "format": args.format,
+        "seed": seed,
+        "total_images": args.total_images,
+        "max_strokes_per_img": args.max_strokes_per_img,
     }
-    for i in range(args.total_images):
-        (img_svg, stroke_masks) = get_training_input_svg_and_masks(256)
-        label = f"{i}-{len(stroke_masks)}"
-        with open(DEST_FOLDER / "sample_svgs" / f"{label}.svg", "w") as img_file:
-            img_file.write(img_svg)
-        print(".")
+    if args.format == "shards":
+        makedirs(DEST_FOLDER / "shards")
+        chunk_size = args.shard_size
+        task_fn = create_shard
+    else:
+        makedirs(DEST_FOLDER / "sample_svgs")
+        chunk_size = SVG_CHUNK_SIZE
+        task_fn = create_sample_svgs
+    tasks = []
+    for start in range(0, args.total_images, chunk_size):
+        end = min(start + chunk_size, args.total_images)
+        if args.format == "shards":
+            tasks.append(
+                (start, end, seed, args.max_strokes_per_img, args.size_px, chunk_size)
+            )
+        else:
+            tasks.append((start, end, seed, args.max_strokes_per_img))
+
+    # create the data
+    results = []
+    with tqdm(total=args.total_images, unit="img") as pbar:
+        for (start, end, *_), result in run_tasks(task_fn, tasks, args.workers):
+            results.append(result)
+            pbar.update(end - start)
+
+    if args.format == "shards":
+        manifest["size_px"] = args.size_px
+        manifest["shards"] = results
+        write_shard_index(DEST_FOLDER / "shards", args.size_px, results)
+    else:
+        manifest["files"] = [
+            filename for filenames in results for filename in filenames
+        ]
+    with open(DEST_FOLDER / "manifest.json", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
     print("Done!")
@@ -0,0 +1,119 @@
+from hanzi_font_deconstructor.common.generate_training_data import (
+    GLYPH_SVGS_DIR,
+    GLYPH_PACK_FILE,
+)
+from hanzi_font_deconstructor.common.batches import collate_uint8
+from hanzi_font_deconstructor.common.shards import PredictionWriter
+from hanzi_font_deconstructor.model.unet.GlyphDataset import GlyphDataset
+from hanzi_font_deconstructor.model.unet.UNet import UNet
+from hanzi_font_deconstructor.model.unet.checkpoints import load_net_state
+from hanzi_font_deconstructor.model.unet.export_net import load_exported_net
+from hanzi_font_deconstructor.model.unet.predict_net import (
+    get_max_tile_size,
+    predict_masks,
+)
+from os import path
+from pathlib import Path
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+import argparse
+import shutil
+import torch
+
+PROJECT_ROOT = Path(__file__).parents[2]
+DEST_FOLDER = PROJECT_ROOT / "predictions"
+
+
+parser = argparse.ArgumentParser(
+    description="Predict the stroke masks of every glyph in a font, writing them into shards"
+)
+parser.add_argument("checkpoint", help="a UNet state dict saved by train_net")
+parser.add_argument(
+    "--exported",
+    action="store_true",
+    help="the checkpoint is a net exported by export_model.py, which always runs on the cpu",
+)
+parser.add_argument(
+    "--glyphs",
+    default=None,
+    help="a glyph pack file or a directory of glyph svgs, defaults to the packed noto glyphs if they've been packed",
+)
+parser.add_argument("--chars", default=None, help="only deconstruct these characters")
+parser.add_argument("--dest", default=str(DEST_FOLDER))
+parser.add_argument("--size-px", default=512, type=int)
+parser.add_argument("--batch-size", default=16, type=int)
+parser.add_argument(
+    "--workers", default=2, type=int, help="number of processes rendering glyphs"
+)
+parser.add_argument("--shard-size", default=1000, type=int)
+parser.add_argument(
+    "--scale",
+    default=1.0,
+    type=float,
+    help="run the model on glyphs downscaled by this much, and upsample its predictions back to --size-px",
+)
+parser.add_argument(
+    "--tile-size",
+    default=None,
+    type=int,
+    help="run the model on overlapping tiles of this size, blending the seams",
+)
+parser.add_argument("--tile-overlap", default=32, type=int)
+parser.add_argument(
+    "--memory-budget-mb",
+    default=None,
+    type=int,
+    help="pick the largest tile size that fits in this much memory, if --tile-size isn't given",
+)
+parser.add_argument("--n-classes", default=3, type=int)
+parser.add_argument("--bilinear", action="store_true")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    glyphs = args.glyphs
+    if glyphs is None:
+        glyphs = GLYPH_PACK_FILE if path.exists(GLYPH_PACK_FILE) else GLYPH_SVGS_DIR
+
+    if args.exported:
+        device = torch.device("cpu")
+        net = load_exported_net(args.checkpoint)
+    else:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        net = UNet(n_channels=1, n_classes=args.n_classes, bilinear=args.bilinear)
+        net.load_state_dict(load_net_state(args.checkpoint, device))
+        net.to(device=device)
+    print(f"Using device {device}")
+
+    tile_size = args.tile_size
+    if tile_size is None and args.memory_budget_mb is not None:
+        tile_size = get_max_tile_size(
+            args.memory_budget_mb * 1024 * 1024, args.batch_size
+        )
+        print(f"Using tiles of {tile_size}px")
+
+    dataset = GlyphDataset(glyphs, chars=args.chars, size_px=args.size_px)
+    loader = DataLoader(
+        dataset,
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        collate_fn=collate_uint8,
+        pin_memory=device.type == "cuda",
+    )
+
+    if path.exists(args.dest):
+        shutil.rmtree(args.dest)
+    with PredictionWriter(args.dest, args.size_px, args.shard_size) as writer:
+        with tqdm(total=len(dataset), unit="glyph") as pbar:
+            predictions = predict_masks(
+                net,
+                loader,
+                device,
+                tile_size=tile_size,
+                overlap=args.tile_overlap,
+                scale=args.scale,
+            )
+            for codepoints, masks in predictions:
+                writer.write_batch(codepoints.numpy(), masks.numpy())
+                pbar.update(len(codepoints))
+    print("Done!")
@@ -0,0 +1,52 @@
+from hanzi_font_deconstructor.model.unet.IndexedStrokeMasksDataset import (
+    IndexedStrokeMasksDataset,
+)
+from hanzi_font_deconstructor.model.unet.UNet import UNet
+from hanzi_font_deconstructor.model.unet.checkpoints import load_net_state
+from hanzi_font_deconstructor.model.unet.export_net import export_net
+import argparse
+import torch
+
+parser = argparse.ArgumentParser(
+    description="Export a trained UNet checkpoint for fast cpu inference, optionally quantized to int8"
+)
+parser.add_argument("checkpoint", help="a UNet state dict saved by train_net")
+parser.add_argument("dest")
+parser.add_argument("--size-px", default=512, type=int)
+parser.add_argument(
+    "--quantize",
+    action="store_true",
+    help="quantize the weights and activations to int8, calibrated on generated training samples",
+)
+parser.add_argument("--calibration-batches", default=8, type=int)
+parser.add_argument("--batch-size", default=4, type=int)
+parser.add_argument("--n-classes", default=3, type=int)
+parser.add_argument("--bilinear", action="store_true")
+
+
+def get_image_batches(dataset, start, num_batches, batch_size):
+    return [
+        torch.stack(
+            [dataset[start + i * batch_size + j]["image"] for j in range(batch_size)]
+        ).float()
+        / 255
+        for i in range(num_batches)
+    ]
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    net = UNet(n_channels=1, n_classes=args.n_classes, bilinear=args.bilinear)
+    net.load_state_dict(load_net_state(args.checkpoint))
+
+    num_samples = (args.calibration_batches + 1) * args.batch_size
+    samples = IndexedStrokeMasksDataset(num_samples, size_px=args.size_px, seed=0)
+    sample_imgs = get_image_batches(samples, 0, 1, args.batch_size)[0]
+    calibration_imgs = None
+    if args.quantize:
+        calibration_imgs = get_image_batches(
+            samples, args.batch_size, args.calibration_batches, args.batch_size
+        )
+
+    exported = export_net(net, args.dest, sample_imgs, calibration_imgs)
+    print(f"Exported {'int8' if exported.quantized else 'float'} net to {args.dest}")
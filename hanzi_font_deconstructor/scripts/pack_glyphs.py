@@ -0,0 +1,28 @@
+from hanzi_font_deconstructor.common.generate_training_data import (
+    GLYPH_SVGS_DIR,
+    GLYPH_PACK_FILE,
+)
+from hanzi_font_deconstructor.common.glyph_pack import pack_glyphs
+from tqdm import tqdm
+import argparse
+
+
+parser = argparse.ArgumentParser(
+    description="Pack the paths of all the glyph svgs into a single indexed file, so looking up a glyph doesn't need a file open"
+)
+parser.add_argument("--glyphs-dir", default=str(GLYPH_SVGS_DIR))
+parser.add_argument("--dest", default=str(GLYPH_PACK_FILE))
+parser.add_argument(
+    "--with-bbox",
+    action="store_true",
+    help="also store the bounding box of every glyph, this is much slower to build",
+)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    with tqdm(unit="glyph") as pbar:
+        count = pack_glyphs(
+            args.glyphs_dir, args.dest, with_bbox=args.with_bbox, progress=pbar.update
+        )
+    print(f"Packed {count} glyphs into {args.dest}")
@@ -1,25 +1,162 @@
-import torch
 from hanzi_font_deconstructor.model.unet.train_net import train_net
 from hanzi_font_deconstructor.model.unet.UNet import UNet
+from hanzi_font_deconstructor.model.unet.telemetry import TelemetryPolicy
+import argparse
+import torch
+
+parser = argparse.ArgumentParser(
+    description="Train the UNet on freshly generated stroke mask samples"
+)
+parser.add_argument("--total-samples", default=10000, type=int)
+parser.add_argument(
+    "--train-shards",
+    default=None,
+    help="train on the samples in this directory of shards from create_training_data.py --format shards, "
+    "instead of generating them",
+)
+parser.add_argument("--val-portion", default=0.1, type=float)
+parser.add_argument("--size-px", default=512, type=int)
+parser.add_argument("--epochs", default=5, type=int)
+parser.add_argument("--batch-size", default=8, type=int)
+parser.add_argument(
+    "--accumulation-steps",
+    default=1,
+    type=int,
+    help="accumulate gradients over this many batches per optimizer step, emulating a bigger batch",
+)
+parser.add_argument("--lr", default=0.001, type=float)
+parser.add_argument(
+    "--dice-weight",
+    default=0.0,
+    type=float,
+    help="add this much of a soft Dice loss to the cross entropy loss",
+)
+parser.add_argument("--n-classes", default=3, type=int)
+parser.add_argument("--bilinear", action="store_true")
+parser.add_argument(
+    "--workers", default=2, type=int, help="number of processes generating samples"
+)
+parser.add_argument("--seed", default=None, type=int)
+parser.add_argument(
+    "--checkpoint-dir", default=None, help="save checkpoints into this directory"
+)
+parser.add_argument(
+    "--checkpoint-every",
+    default=None,
+    type=int,
+    help="also save the full training state every this many steps, not just after every epoch",
+)
+parser.add_argument(
+    "--resume", default=None, help="resume from a CP_latest.pth training state"
+)
+parser.add_argument(
+    "--val-batch-size",
+    default=None,
+    type=int,
+    help="batch size for validation, defaults to 4 training batches",
+)
+parser.add_argument(
+    "--val-samples-per-eval",
+    default=None,
+    type=int,
+    help="evaluate on only this many of the validation samples each time",
+)
+parser.add_argument(
+    "--eval-interval",
+    default=None,
+    type=float,
+    help="evaluate every this many seconds, rather than ten times an epoch",
+)
+parser.add_argument(
+    "--val-cache",
+    default=None,
+    help="keep the validation samples in this file, reused by runs with the same --seed",
+)
+parser.add_argument(
+    "--histogram-every",
+    default=10,
+    type=int,
+    help="log weight and gradient histograms every this many evaluations, 0 for never",
+)
+parser.add_argument(
+    "--no-param-stats",
+    action="store_true",
+    help="don't log the norm, min, max and mean of every weight and gradient",
+)
+parser.add_argument(
+    "--sync-histograms",
+    action="store_true",
+    help="write histograms on the training thread",
+)
+parser.add_argument(
+    "--bf16",
+    action="store_true",
+    help="train under bfloat16 autocast, fastest on CPUs with AVX-512 BF16 or AMX",
+)
+parser.add_argument(
+    "--channels-last", action="store_true", help="use the NHWC memory format"
+)
+parser.add_argument(
+    "--threads",
+    default=None,
+    type=int,
+    help="threads for intra-op parallelism, leave some cores for the --workers generating samples",
+)
+parser.add_argument(
+    "--interop-threads",
+    default=None,
+    type=int,
+    help="threads for running independent ops in parallel",
+)
+parser.add_argument(
+    "--cpu", action="store_true", help="train on the cpu even if cuda is available"
+)
 
 if __name__ == "__main__":
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device {device}")
+    args = parser.parse_args()
+    # both have to be set before torch does any parallel work
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.interop_threads:
+        torch.set_num_interop_threads(args.interop_threads)
+
+    device = torch.device(
+        "cuda" if torch.cuda.is_available() and not args.cpu else "cpu"
+    )
+    print(f"Using device {device} with {torch.get_num_threads()} threads")
 
     net = UNet(
         n_channels=1,
-        n_classes=5,
-        bilinear=False,
+        n_classes=args.n_classes,
+        bilinear=args.bilinear,
     )
     net.to(device=device)
     train_net(
         net,
         device,
-        total_samples=10000,
-        max_strokes=5,
-        size_px=512,
-        epochs=5,
-        batch_size=1,
-        lr=0.001,
-        val_portion=0.1,
+        total_samples=args.total_samples,
+        size_px=args.size_px,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        lr=args.lr,
+        val_portion=args.val_portion,
+        save_cp_dir=args.checkpoint_dir,
+        num_workers=args.workers,
+        seed=args.seed,
+        resume_from=args.resume,
+        checkpoint_every=args.checkpoint_every,
+        accumulation_steps=args.accumulation_steps,
+        bf16=args.bf16,
+        channels_last=args.channels_last,
+        val_batch_size=args.val_batch_size,
+        val_samples_per_eval=args.val_samples_per_eval,
+        eval_interval=args.eval_interval,
+        val_cache=args.val_cache,
+        dice_weight=args.dice_weight,
+        train_shards=args.train_shards,
+        telemetry=TelemetryPolicy(
+            param_stats=not args.no_param_stats,
+            histogram_every=args.histogram_every,
+            async_histograms=not args.sync_histograms,
+        ),
     )
@@ -0,0 +1,55 @@
+from math import cos, radians, sin, tan
+import numpy as np
+from hanzi_font_deconstructor.common.TransformedStroke import TransformedStroke
+from hanzi_font_deconstructor.common.affine import (
+    apply_matrix,
+    get_stroke_matrices,
+    get_viewbox_matrix,
+    transform_polygons,
+)
+from hanzi_font_deconstructor.common.transform_stroke import get_transformed_polygons
+
+
+def test_get_stroke_matrices_matches_svg_transform_order():
+    translate = np.array([[1, 0, 12], [0, 1, 134], [0, 0, 1]])
+    r = radians(-3)
+    rotate = np.array([[cos(r), -sin(r), 0], [sin(r), cos(r), 0], [0, 0, 1]])
+    skew_x = np.array([[1, tan(radians(3)), 0], [0, 1, 0], [0, 0, 1]])
+    skew_y = np.array([[1, 0, 0], [tan(radians(-1)), 1, 0], [0, 0, 1]])
+    scale = np.diag([0.3, 1.7, 1])
+    expected = translate @ rotate @ skew_x @ skew_y @ scale
+
+    matrices = get_stroke_matrices([(12, 134)], [-3], [3], [-1], [(0.3, 1.7)])
+    assert matrices.shape == (1, 3, 3)
+    np.testing.assert_allclose(matrices[0], expected)
+
+
+def test_get_viewbox_matrix():
+    matrix = get_viewbox_matrix((-10, 0, 1010, 1000), 256, 256)
+    corners = apply_matrix(matrix, np.array([[-10, 0], [1000, 1000]]))
+    scale = 256 / 1010
+    np.testing.assert_allclose(corners, [[0, 5 * scale], [256, 256 - 5 * scale]])
+
+
+def test_transform_polygons_matches_individual_transforms():
+    matrices = get_stroke_matrices([(0, 0), (5, -5)], [10, 0], [0, 4], [2, 0], [1, 2])
+    polygons = [np.random.rand(3, 2), np.random.rand(7, 2)]
+    transformed = transform_polygons(matrices, polygons)
+    assert [polygon.shape for polygon in transformed] == [(3, 2), (7, 2)]
+    for matrix, polygon, result in zip(matrices, polygons, transformed):
+        np.testing.assert_allclose(result, apply_matrix(matrix, polygon))
+
+
+def test_transformed_stroke_polygon():
+    stroke = TransformedStroke(
+        translate=(100, -50),
+        rotate=0,
+        skewX=0,
+        skewY=0,
+        scale=(1, 1),
+        path="M48 450h908v81h-908v-81z",
+    )
+    polygon = stroke.polygon()
+    np.testing.assert_allclose(polygon.min(0), [148, 400])
+    np.testing.assert_allclose(polygon.max(0), [1056, 481])
+    np.testing.assert_allclose(get_transformed_polygons([stroke])[0], polygon)
@@ -0,0 +1,36 @@
+import torch
+from torch.utils.data import DataLoader
+from hanzi_font_deconstructor.common.batches import (
+    collate_uint8,
+    images_to_device,
+    masks_to_device,
+    uint8_sample,
+)
+
+
+def test_uint8_samples_round_trip_through_a_loader():
+    input = torch.rand((1, 8, 8))
+    mask = torch.randint(0, 3, (8, 8))
+    samples = [uint8_sample(input, mask) for _ in range(4)]
+    assert samples[0]["image"].dtype == torch.uint8
+    assert samples[0]["mask"].dtype == torch.uint8
+
+    loader = DataLoader(samples, batch_size=2, num_workers=1, collate_fn=collate_uint8)
+    for batch in loader:
+        assert batch["image"].shape == (2, 1, 8, 8)
+        assert batch["mask"].shape == (2, 8, 8)
+        imgs = images_to_device(batch["image"], torch.device("cpu"))
+        masks = masks_to_device(batch["mask"], torch.device("cpu"))
+        assert imgs.dtype == torch.float32
+        assert torch.allclose(imgs[0], input, atol=1 / 255)
+        assert masks.dtype == torch.long
+        assert torch.equal(masks[0], mask)
+
+
+def test_collate_uint8_batches_non_tensor_fields():
+    samples = [
+        {"image": torch.zeros((1, 4, 4), dtype=torch.uint8), "codepoint": i}
+        for i in range(3)
+    ]
+    batch = collate_uint8(samples)
+    assert batch["codepoint"].tolist() == [0, 1, 2]
@@ -1,5 +1,18 @@
+import random
+import pytest
+import torch
+from hanzi_font_deconstructor.common.generate_svg import generate_svg, get_stroke_attrs
 from hanzi_font_deconstructor.common.generate_training_data import (
+    STROKE_VIEW_BOX,
+    StrokeMaskStack,
+    composite_alphas,
+    generate_sample,
+    generate_strokes,
+    get_mask_span,
+    get_labels,
     get_training_input_and_mask_tensors,
+    img_to_greyscale_tensor,
+    is_stroke_good,
 )
 
 
@@ -7,3 +20,126 @@ def test_get_training_input_and_mask_tensors():
     input, mask = get_training_input_and_mask_tensors(size_px=256)
     assert input.shape == (1, 256, 256)
     assert mask.shape == (256, 256)
+    assert mask.dtype == torch.uint8
+    assert mask.max() <= 2
+
+
+def test_generate_sample_is_reproducible():
+    input, mask = generate_sample(3, seed=7, size_px=64)
+    same_input, same_mask = generate_sample(3, seed=7, size_px=64)
+    assert torch.equal(input, same_input)
+    assert torch.equal(mask, same_mask)
+
+
+def rect_mask(min_x, max_x, min_y, max_y, size_px=64):
+    mask = torch.zeros((size_px, size_px), dtype=torch.bool)
+    mask[min_y:max_y, min_x:max_x] = True
+    return mask
+
+
+def test_is_stroke_good():
+    horiz = rect_mask(5, 55, 20, 25)
+    vert = rect_mask(30, 35, 5, 55)
+    assert is_stroke_good(vert, [])
+    # a small crossing is fine
+    assert is_stroke_good(vert, [horiz])
+    # running along the same line as an existing stroke is not
+    assert not is_stroke_good(rect_mask(10, 50, 22, 27), [horiz])
+    # the first existing stroke which doesn't overlap at all accepts the stroke
+    assert is_stroke_good(vert, [rect_mask(0, 5, 0, 5), rect_mask(28, 37, 5, 55)])
+    assert not is_stroke_good(vert, [rect_mask(28, 37, 5, 55), rect_mask(0, 5, 0, 5)])
+
+
+def reference_is_stroke_good(mask, existing_masks):
+    "the original one-mask-at-a-time check, which StrokeMaskStack must agree with"
+    if len(existing_masks) == 0:
+        return True
+    mask_size = torch.sum(mask).item()
+    mask_span = get_mask_span(mask)
+    for existing_mask in existing_masks:
+        existing_mask_size = torch.sum(existing_mask).item()
+        overlaps = existing_mask & mask
+        overlaps_size = torch.sum(overlaps).item()
+        if overlaps_size == 0:
+            return True
+        if overlaps_size / existing_mask_size > 0.25:
+            return False
+        if overlaps_size / mask_size > 0.25:
+            return False
+        overlaps_span = get_mask_span(overlaps)
+        if max(overlaps_span) / max(get_mask_span(existing_mask)) > 0.4:
+            return False
+        if max(overlaps_span) / max(mask_span) > 0.4:
+            return False
+    return True
+
+
+def test_stroke_mask_stack_matches_list():
+    masks = [rect_mask(5, 55, 20, 25), rect_mask(40, 45, 0, 60)]
+    stack = StrokeMaskStack(masks)
+    assert len(stack) == 2
+    assert stack.sizes.tolist() == [250, 300]
+    candidates = [
+        rect_mask(30, 35, 5, 55),
+        rect_mask(38, 47, 0, 60),
+        rect_mask(0, 3, 0, 3),
+    ]
+    results = [stack.is_stroke_good(candidate) for candidate in candidates]
+    assert results == [True, False, True]
+    assert results == [reference_is_stroke_good(c, masks) for c in candidates]
+
+    generator = torch.Generator().manual_seed(0)
+
+    def random_rect():
+        min_x, min_y = torch.randint(0, 32, (2,), generator=generator).tolist()
+        width, height = torch.randint(2, 32, (2,), generator=generator).tolist()
+        return rect_mask(min_x, min_x + width, min_y, min_y + height)
+
+    for _ in range(50):
+        masks = [random_rect() for _ in range(4)]
+        candidate = random_rect()
+        expected = reference_is_stroke_good(candidate, masks)
+        assert StrokeMaskStack(masks).is_stroke_good(candidate) == expected
+
+
+def test_get_labels():
+    masks = torch.stack(
+        [rect_mask(5, 55, 20, 25), rect_mask(30, 35, 5, 55), rect_mask(0, 64, 22, 23)]
+    )
+    labels = get_labels(masks)
+    assert labels.dtype == torch.uint8
+    assert labels[0, 0] == 0
+    assert labels[10, 32] == 1
+    assert labels[21, 32] == 2
+    # more than 2 strokes overlapping is still the overlap class
+    assert labels[22, 32] == 2
+
+
+def test_composite_alphas():
+    alpha = torch.tensor([[0.0, 0.5], [1.0, 0.25]])
+    # a single stroke is its own image
+    assert torch.equal(composite_alphas([alpha]), alpha)
+
+    other = torch.tensor([[0.5, 0.5], [0.0, 1.0]])
+    expected = torch.tensor([[0.5, 0.75], [1.0, 1.0]])
+    assert torch.allclose(composite_alphas([alpha, other]), expected)
+    assert torch.allclose(composite_alphas([other, alpha]), expected)
+
+    with pytest.raises(Exception, match="no strokes"):
+        composite_alphas([])
+
+
+def test_composite_alphas_matches_svg_render(cairosvg):
+    from hanzi_font_deconstructor.common.svg_to_pil import svg_to_pil
+
+    size_px = 128
+    for seed in range(3):
+        strokes, stroke_alphas, _ = generate_strokes(size_px, rng=random.Random(seed))
+        input_svg = generate_svg(
+            [get_stroke_attrs(stroke) for stroke in strokes], STROKE_VIEW_BOX
+        )
+        expected = img_to_greyscale_tensor(svg_to_pil(input_svg, size_px, size_px))
+        # antialiased edges where strokes cross can blend slightly differently
+        diff = torch.abs(composite_alphas(stroke_alphas) - expected)
+        assert diff.mean() < 0.01
+        assert diff.max() < 0.25
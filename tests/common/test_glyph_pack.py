@@ -0,0 +1,74 @@
+from hanzi_font_deconstructor.common.glyph_pack import (
+    GlyphDir,
+    GlyphPack,
+    open_glyphs,
+    pack_glyphs,
+    read_glyph_svg_path,
+)
+import math
+import pickle
+
+GLYPH_SVG = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="-10 0 1010 1000">
+<path fill="currentColor"
+d="{}" />
+</svg>"""
+
+
+def write_glyphs(glyphs_dir):
+    paths = {
+        "一": "M10 10h100v20h-100z",
+        "丨": "M50 0v200h20v-200z",
+        "𠃍": "M0 0h300v300h-20v-280h-280z",
+    }
+    for char, path in paths.items():
+        (glyphs_dir / f"{hex(ord(char))[2:]}.svg").write_text(GLYPH_SVG.format(path))
+    # no path, and a file that isn't named after a codepoint
+    (glyphs_dir / "0000.svg").write_text("<svg><g /></svg>")
+    (glyphs_dir / "xxxx.svg").write_text(GLYPH_SVG.format("M0 0h1v1z"))
+    return paths
+
+
+def test_glyph_pack_matches_svgs(tmp_path):
+    paths = write_glyphs(tmp_path)
+    pack_file = tmp_path / "glyphs.pack"
+    assert pack_glyphs(tmp_path, pack_file) == 3
+
+    pack = GlyphPack(pack_file)
+    assert len(pack) == 3
+    assert list(pack.chars()) == sorted(paths, key=ord)
+    for char, path in paths.items():
+        assert char in pack
+        assert pack.get_path(char) == path
+        assert read_glyph_svg_path(tmp_path / f"{hex(ord(char))[2:]}.svg") == path
+        assert pack.get_bbox(char) is None
+    assert "丶" not in pack
+    assert pack.get_path("丶") is None
+    assert pack.get_path("\0") is None
+
+    unpickled = pickle.loads(pickle.dumps(pack))
+    assert unpickled.get_path("丨") == paths["丨"]
+
+
+def test_glyph_pack_bbox(tmp_path):
+    write_glyphs(tmp_path)
+    pack_file = tmp_path / "glyphs.pack"
+    pack_glyphs(tmp_path, pack_file, with_bbox=True)
+
+    bbox = GlyphPack(pack_file).get_bbox("一")
+    assert all(math.isclose(a, b) for a, b in zip(bbox, (10, 110, 10, 30)))
+
+
+def test_glyph_dir_matches_glyph_pack(tmp_path):
+    paths = write_glyphs(tmp_path)
+    pack_file = tmp_path / "glyphs.pack"
+    pack_glyphs(tmp_path, pack_file)
+
+    glyph_dir = open_glyphs(tmp_path)
+    assert isinstance(glyph_dir, GlyphDir)
+    assert isinstance(open_glyphs(pack_file), GlyphPack)
+    # the dir also lists the glyph without a path
+    assert list(glyph_dir.chars()) == ["\0"] + sorted(paths, key=ord)
+    for char, path in paths.items():
+        assert glyph_dir.get_path(char) == path
+    assert glyph_dir.get_path("\0") is None
+    assert glyph_dir.get_path("丶") is None
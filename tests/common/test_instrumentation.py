@@ -0,0 +1,40 @@
+import torch
+from hanzi_font_deconstructor.common import instrumentation
+from hanzi_font_deconstructor.common.generate_training_data import generate_sample
+from hanzi_font_deconstructor.common.instrumentation import SharedStats
+from hanzi_font_deconstructor.model.unet.IndexedStrokeMasksDataset import (
+    IndexedStrokeMasksDataset,
+)
+
+
+def test_instrumentation_is_a_no_op_when_disabled():
+    instrumentation.disable()
+    instrumentation.reset()
+    generate_sample(0, 1, size_px=64)
+    assert all(value == 0 for value in instrumentation.snapshot().values())
+
+
+def test_shared_stats_collect_from_workers():
+    stats = SharedStats(num_workers=2)
+    dataset = IndexedStrokeMasksDataset(6, size_px=64, seed=1, stats=stats)
+    loader = torch.utils.data.DataLoader(dataset, batch_size=2, num_workers=2)
+    for _ in loader:
+        pass
+
+    totals = stats.totals()
+    assert totals["samples"] == 6
+    assert totals["accepted"] > 0
+    assert totals["candidates"] >= totals["rendered"] >= totals["accepted"]
+    assert totals["time/sample"] >= totals["time/render"] > 0
+    # both workers generated samples, and the main process didn't
+    assert stats.values[0].sum() == 0
+    assert (stats.values[1:, 0] > 0).all()
+
+
+def test_shared_stats_leave_the_main_process_disabled():
+    instrumentation.disable()
+    stats = SharedStats(num_workers=0)
+    dataset = IndexedStrokeMasksDataset(2, size_px=64, seed=1, stats=stats)
+    dataset[0]
+    assert not instrumentation.enabled
+    assert stats.totals()["samples"] == 1
@@ -0,0 +1,45 @@
+from hanzi_font_deconstructor.common.occupancy import get_occupancy, is_obviously_bad
+from hanzi_font_deconstructor.common.stroke_library import compile_stroke
+
+
+def occupancy_for(pathstr, grid_size=20):
+    stroke = compile_stroke(pathstr)
+    return get_occupancy(stroke.polygon, stroke.polygon_edges, grid_size)
+
+
+def test_get_occupancy():
+    occupancy = occupancy_for("M2 3h5v2h-5z")
+    assert occupancy.origin == (2, 3)
+    assert occupancy.cells.shape == (2, 5)
+    assert occupancy.cells.all()
+    assert occupancy.size == 10
+
+
+def test_get_occupancy_uses_nonzero_winding():
+    # an inner contour with the opposite winding cuts a hole
+    square_with_hole = occupancy_for("M0 0h6v6h-6zM2 2v2h2v-2z")
+    assert square_with_hole.size == 32
+    assert not square_with_hole.cells[2:4, 2:4].any()
+    # one with the same winding doesn't
+    overlapping_squares = occupancy_for("M0 0h6v6h-6zM2 2h2v2h-2z")
+    assert overlapping_squares.size == 36
+
+
+def test_overlap_size():
+    horiz = occupancy_for("M0 5h10v2h-10z")
+    vert = occupancy_for("M4 0h2v10h-2z")
+    assert horiz.overlap_size(vert) == 4
+    assert vert.overlap_size(horiz) == 4
+    assert horiz.overlap_size(occupancy_for("M12 12h2v2h-2z")) == 0
+
+
+def test_is_obviously_bad():
+    horiz = occupancy_for("M0 5h10v2h-10z")
+    assert not is_obviously_bad(horiz, [], 0.35)
+    # crossing strokes are left for the full check
+    assert not is_obviously_bad(occupancy_for("M4 0h2v10h-2z"), [horiz], 0.35)
+    # a stroke lying along an existing one is rejected
+    assert is_obviously_bad(occupancy_for("M1 5h8v3h-8z"), [horiz], 0.35)
+    # the first existing stroke that can't overlap at all decides the stroke is fine
+    far_away = occupancy_for("M15 15h2v2h-2z")
+    assert not is_obviously_bad(occupancy_for("M1 5h8v3h-8z"), [far_away, horiz], 0.35)
@@ -0,0 +1,75 @@
+import pickle
+import numpy as np
+import torch
+from hanzi_font_deconstructor.common.shards import (
+    PredictionReader,
+    PredictionWriter,
+    ShardReader,
+    ShardWriter,
+    image_to_uint8,
+    read_shard_index,
+)
+
+
+def make_sample(i, size_px=8):
+    image = torch.full((1, size_px, size_px), i * 20 / 255)
+    mask = torch.full((size_px, size_px), i % 3, dtype=torch.uint8)
+    return image, mask
+
+
+def write_samples(writer, indices):
+    samples = [make_sample(i) for i in indices]
+    writer.write_batch(
+        np.stack([image_to_uint8(image) for image, _ in samples]),
+        np.stack([mask.numpy() for _, mask in samples]),
+    )
+
+
+def test_shards_round_trip(tmp_path):
+    with ShardWriter(tmp_path, 8, shard_size=4) as writer:
+        write_samples(writer, range(3))
+        write_samples(writer, range(3, 10))
+
+    index = read_shard_index(tmp_path)
+    assert index["size_px"] == 8
+    assert index["arrays"] == ["images", "masks"]
+    assert [shard["count"] for shard in index["shards"]] == [4, 4, 2]
+
+    reader = ShardReader(tmp_path)
+    assert len(reader) == 10
+    for i in [0, 3, 4, 9, -1]:
+        image, mask = reader[i]
+        _, expected_mask = make_sample(i % 10)
+        assert image.dtype == np.uint8
+        assert image.shape == (8, 8)
+        assert image[0, 0] == (i % 10) * 20
+        assert np.array_equal(mask, expected_mask.numpy())
+
+
+def test_shard_reader_pickles_without_memory_maps(tmp_path):
+    with ShardWriter(tmp_path, 8, shard_size=4) as writer:
+        write_samples(writer, range(5))
+    reader = ShardReader(tmp_path)
+    reader[4]
+    assert len(reader.mapped_shards) == 1
+    unpickled = pickle.loads(pickle.dumps(reader))
+    assert unpickled.mapped_shards == {}
+    assert np.array_equal(unpickled[4][1], reader[4][1])
+
+
+def test_predictions_round_trip(tmp_path):
+    chars = "一丨丶丿乀乁乚"
+    codepoints = np.array([ord(char) for char in chars], dtype=np.uint32)
+    masks = np.stack([np.full((8, 8), i % 3, dtype=np.uint8) for i in range(7)])
+    with PredictionWriter(tmp_path, 8, shard_size=3) as writer:
+        writer.write_batch(codepoints[:2], masks[:2])
+        writer.write_batch(codepoints[2:], masks[2:])
+
+    shards = read_shard_index(tmp_path)["shards"]
+    assert [shard["count"] for shard in shards] == [3, 3, 1]
+    reader = PredictionReader(tmp_path)
+    assert len(reader) == 7
+    for i, char in enumerate(chars):
+        assert char in reader
+        assert np.array_equal(reader.get_mask(char), masks[i])
+    assert "丨" in reader and "二" not in reader
@@ -0,0 +1,36 @@
+import random
+import torch
+from hanzi_font_deconstructor.common.generate_svg import generate_svg, get_stroke_attrs
+from hanzi_font_deconstructor.common.generate_training_data import (
+    STROKE_VIEW_BOX,
+    get_stroke_tables,
+    img_to_greyscale_tensor,
+    render_stroke_alpha,
+)
+from hanzi_font_deconstructor.common.transform_stroke import transform_stroke
+
+
+def svg_stroke_alpha(stroke, size_px):
+    "render a stroke the old way, as a single stroke svg through cairosvg"
+    from hanzi_font_deconstructor.common.svg_to_pil import svg_to_pil
+
+    svg = generate_svg([get_stroke_attrs(stroke)], STROKE_VIEW_BOX)
+    return img_to_greyscale_tensor(svg_to_pil(svg, size_px, size_px))
+
+
+def test_render_stroke_alpha_matches_svg_render(cairosvg):
+    rng = random.Random(0)
+    single_strokes = get_stroke_tables().single_strokes
+    for size_px in [64, 256]:
+        for _ in range(5):
+            stroke = transform_stroke(
+                single_strokes.choice(rng), STROKE_VIEW_BOX, rng=rng
+            )
+            alpha = render_stroke_alpha(stroke, size_px)
+            expected = svg_stroke_alpha(stroke, size_px)
+            assert alpha.shape == expected.shape
+            assert expected.sum() > 0
+            # both go through cairo, so only antialiasing along the edges can differ
+            diff = torch.abs(alpha - expected)
+            assert diff.mean() < 0.01
+            assert diff.max() < 0.25
@@ -1,4 +1,15 @@
 import os
 import sys
+import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+
+@pytest.fixture
+def cairosvg():
+    "the svg renderer, for tests comparing against it. These are skipped if cairo isn't installed"
+    try:
+        import cairosvg
+    except (ImportError, OSError):
+        pytest.skip("cairo is not installed")
+    return cairosvg
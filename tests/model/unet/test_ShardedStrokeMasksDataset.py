@@ -0,0 +1,59 @@
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from hanzi_font_deconstructor.common.batches import collate_uint8
+from hanzi_font_deconstructor.common.shards import ShardWriter
+from hanzi_font_deconstructor.model.unet.ShardedStrokeMasksDataset import (
+    ShardedStrokeMasksDataset,
+)
+from hanzi_font_deconstructor.model.unet.UNet import UNet
+from hanzi_font_deconstructor.model.unet.train_net import train_net
+
+
+def write_shards(shards_dir, count, size_px=32):
+    images = np.stack(
+        [np.full((size_px, size_px), i, dtype=np.uint8) for i in range(count)]
+    )
+    masks = np.stack(
+        [np.full((size_px, size_px), i % 3, dtype=np.uint8) for i in range(count)]
+    )
+    with ShardWriter(shards_dir, size_px, shard_size=3) as writer:
+        writer.write_batch(images, masks)
+
+
+def test_loader_over_shards(tmp_path):
+    write_shards(tmp_path, 5)
+    dataset = ShardedStrokeMasksDataset(tmp_path)
+    assert len(dataset) == 5
+    assert dataset.size_px == 32
+    loader = DataLoader(dataset, batch_size=2, num_workers=1, collate_fn=collate_uint8)
+    batches = list(loader)
+    assert [len(batch["image"]) for batch in batches] == [2, 2, 1]
+    images = torch.cat([batch["image"] for batch in batches])
+    masks = torch.cat([batch["mask"] for batch in batches])
+    assert images.shape == (5, 1, 32, 32)
+    assert images.dtype == masks.dtype == torch.uint8
+    assert images[:, 0, 0, 0].tolist() == [0, 1, 2, 3, 4]
+    assert masks[:, 0, 0].tolist() == [0, 1, 2, 0, 1]
+
+
+def test_train_net_on_shards(tmp_path, monkeypatch):
+    # tensorboard writes its runs into the working directory
+    monkeypatch.chdir(tmp_path)
+    write_shards(tmp_path / "shards", 4)
+    torch.manual_seed(0)
+    net = UNet(n_channels=1, n_classes=3, bilinear=False)
+    before = [param.detach().clone() for param in net.parameters()]
+    train_net(
+        net,
+        torch.device("cpu"),
+        epochs=1,
+        batch_size=2,
+        val_portion=0.2,
+        num_workers=0,
+        seed=1,
+        train_shards=tmp_path / "shards",
+    )
+    assert any(
+        not torch.equal(param, old) for param, old in zip(net.parameters(), before)
+    )
@@ -0,0 +1,36 @@
+import torch
+from hanzi_font_deconstructor.model.unet.ValidationSet import ValidationSet
+
+
+def test_validation_set_is_generated_once_and_cached(tmp_path):
+    cache_file = tmp_path / "validation.pt"
+    validation_set = ValidationSet.load_or_generate(
+        cache_file, 5, size_px=32, seed="test", batch_size=2
+    )
+    assert validation_set.images.shape == (5, 1, 32, 32)
+    assert validation_set.masks.shape == (5, 32, 32)
+    assert validation_set.images.dtype == torch.uint8
+    batches = list(validation_set)
+    assert len(batches) == len(validation_set) == 3
+    assert [len(batch["image"]) for batch in batches] == [2, 2, 1]
+
+    cached = ValidationSet.load_or_generate(
+        cache_file, 5, size_px=32, seed="test", batch_size=2
+    )
+    assert torch.equal(cached.images, validation_set.images)
+    assert torch.equal(cached.masks, validation_set.masks)
+
+    subset = validation_set.subset(3)
+    assert len(subset.images) == 3
+    assert subset.images.data_ptr() == validation_set.images.data_ptr()
+
+
+def test_loaded_validation_set_keeps_its_seed(tmp_path, monkeypatch):
+    cache_file = tmp_path / "validation.pt"
+    ValidationSet.load_or_generate(cache_file, 2, size_px=32, seed="test")
+    cached = ValidationSet.load_or_generate(cache_file, 2, size_px=32, seed="test")
+    assert cached.seed == "test"
+    assert cached.subset(1).seed == "test"
+    # pinning needs cuda, which the tests can't count on
+    monkeypatch.setattr(torch.Tensor, "pin_memory", lambda tensor: tensor)
+    assert cached.pin_memory().seed == "test"
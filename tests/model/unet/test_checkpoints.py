@@ -0,0 +1,81 @@
+import random
+import pytest
+import torch
+from hanzi_font_deconstructor.model.unet.UNet import UNet
+from hanzi_font_deconstructor.model.unet.checkpoints import (
+    CheckpointWriter,
+    OffsetSampler,
+    get_training_state,
+    load_checkpoint,
+    load_net_state,
+    restore_training_state,
+)
+
+
+def make_training(lr=0.01):
+    net = UNet(n_channels=1, n_classes=3, bilinear=False)
+    optimizer = torch.optim.RMSprop(net.parameters(), lr=lr, momentum=0.9)
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, "min")
+    return net, optimizer, scheduler
+
+
+def train_step(net, optimizer):
+    loss = net(torch.rand(1, 1, 32, 32)).mean()
+    optimizer.zero_grad()
+    loss.backward()
+    optimizer.step()
+
+
+def test_resumed_training_matches_uninterrupted_training(tmp_path):
+    torch.manual_seed(0)
+    net, optimizer, scheduler = make_training()
+    train_step(net, optimizer)
+    scheduler.step(1.0)
+    dest = tmp_path / "CP_latest.pth"
+    with CheckpointWriter() as writer:
+        writer.write(
+            get_training_state(
+                net, optimizer, scheduler, 2, 12, 7, 1234, {"batch_size": 4}
+            ),
+            dest,
+        )
+    # the checkpoint was copied, so training on doesn't change it
+    train_step(net, optimizer)
+    expected = [p.detach().clone() for p in net.parameters()]
+    expected_random = random.random()
+
+    checkpoint = load_checkpoint(dest)
+    assert (checkpoint["epoch"], checkpoint["epoch_samples"]) == (2, 12)
+    assert (checkpoint["global_step"], checkpoint["seed"]) == (7, 1234)
+    resumed, resumed_optimizer, resumed_scheduler = make_training(lr=0.5)
+    with pytest.raises(Exception, match="batch_size=8"):
+        restore_training_state(
+            checkpoint,
+            resumed,
+            resumed_optimizer,
+            resumed_scheduler,
+            settings={"batch_size": 8},
+        )
+    restore_training_state(
+        checkpoint,
+        resumed,
+        resumed_optimizer,
+        resumed_scheduler,
+        settings={"batch_size": 4},
+    )
+    assert resumed_optimizer.param_groups[0]["lr"] == 0.01
+    assert resumed_scheduler.best == 1.0
+    train_step(resumed, resumed_optimizer)
+    for param, expected_param in zip(resumed.parameters(), expected):
+        assert torch.equal(param, expected_param)
+    assert random.random() == expected_random
+
+    assert load_net_state(dest).keys() == net.state_dict().keys()
+
+
+def test_offset_sampler():
+    sampler = OffsetSampler(5, start=3)
+    assert list(sampler) == [3, 4]
+    assert len(sampler) == 2
+    sampler.start = 0
+    assert list(sampler) == [0, 1, 2, 3, 4]
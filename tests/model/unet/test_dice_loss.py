@@ -0,0 +1,48 @@
+import torch
+from hanzi_font_deconstructor.model.unet.dice_loss import (
+    DiceLoss,
+    dice_and_iou,
+    dice_coeff,
+    multiclass_scores,
+    one_hot_masks,
+)
+
+
+def test_dice_and_iou_match_a_per_sample_loop():
+    torch.manual_seed(0)
+    logits = torch.randn(4, 3, 16, 16)
+    target = torch.randint(0, 3, (4, 16, 16))
+    dice, iou = multiclass_scores(logits, target)
+    assert dice.shape == iou.shape == (4, 3)
+    pred = logits.argmax(1)
+    for n in range(4):
+        for c in range(3):
+            pred_c = pred[n] == c
+            true_c = target[n] == c
+            inter = (pred_c & true_c).sum().item()
+            total = pred_c.sum().item() + true_c.sum().item()
+            assert torch.isclose(
+                dice[n, c], torch.tensor((2 * inter + 1e-4) / (total + 1e-4))
+            )
+            assert torch.isclose(
+                iou[n, c], torch.tensor((inter + 1e-4) / (total - inter + 1e-4))
+            )
+
+
+def test_perfect_predictions_score_1():
+    target = torch.randint(0, 3, (2, 8, 8))
+    masks = one_hot_masks(target, 3)
+    dice, iou = dice_and_iou(masks, masks)
+    assert torch.allclose(dice, torch.ones(2, 3))
+    assert torch.allclose(iou, torch.ones(2, 3))
+    assert torch.isclose(dice_coeff(masks[:, 1], masks[:, 1]), torch.tensor(1.0))
+    assert DiceLoss()(masks * 100, target) < 1e-3
+
+
+def test_dice_loss_has_gradients():
+    logits = torch.randn(2, 3, 8, 8, requires_grad=True)
+    target = torch.randint(0, 3, (2, 8, 8))
+    loss = DiceLoss(class_weights=[1, 1, 4])(logits, target)
+    loss.backward()
+    assert 0 < loss.item() < 1
+    assert logits.grad.abs().sum() > 0
@@ -0,0 +1,50 @@
+import torch
+from hanzi_font_deconstructor.model.unet.UNet import UNet
+from hanzi_font_deconstructor.model.unet.export_net import (
+    export_net,
+    fuse_net,
+    load_exported_net,
+)
+
+
+def make_net():
+    torch.manual_seed(0)
+    net = UNet(n_channels=1, n_classes=3, bilinear=False)
+    # give the batch norms something to fold
+    for module in net.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.1, 0.1)
+            module.running_var.uniform_(0.5, 1.5)
+            module.weight.data.uniform_(0.5, 1.5)
+    return net.eval()
+
+
+def test_fuse_net_matches_eager_net():
+    net = make_net()
+    imgs = torch.rand(2, 1, 64, 64)
+    with torch.inference_mode():
+        assert torch.allclose(net(imgs), fuse_net(net)(imgs), atol=1e-4)
+
+
+def test_export_and_load_float_net(tmp_path):
+    net = make_net()
+    imgs = torch.rand(2, 1, 64, 64)
+    export_net(net, tmp_path / "net.pt", imgs)
+
+    exported = load_exported_net(tmp_path / "net.pt")
+    assert exported.n_classes == 3
+    assert not exported.quantized
+    with torch.inference_mode():
+        assert torch.allclose(net(imgs), exported(imgs), atol=1e-3)
+
+
+def test_export_and_load_int8_net(tmp_path):
+    net = make_net()
+    imgs = torch.rand(2, 1, 64, 64)
+    calibration_imgs = [torch.rand(2, 1, 64, 64) for _ in range(2)] + [imgs]
+    export_net(net, tmp_path / "net.pt", imgs, calibration_imgs)
+
+    exported = load_exported_net(tmp_path / "net.pt")
+    assert exported.quantized
+    with torch.inference_mode():
+        assert exported(imgs).shape == (2, 3, 64, 64)
@@ -0,0 +1,52 @@
+import math
+import torch
+from hanzi_font_deconstructor.model.unet.dice_loss import multiclass_scores
+from hanzi_font_deconstructor.model.unet.metrics import ConfusionMatrix
+
+
+def test_confusion_matrix_metrics():
+    # true classes 0 0 1 1 2 2, predicted 0 1 1 1 2 0
+    target = torch.tensor([[[0, 0, 1, 1, 2, 2]]])
+    pred = torch.tensor([[[0, 1, 1, 1, 2, 0]]])
+    logits = torch.nn.functional.one_hot(pred, 3).permute(0, 3, 1, 2).float()
+    confusion_matrix = ConfusionMatrix(3)
+    # updated in two halves, to check it accumulates
+    confusion_matrix.update(logits[..., :3], target[..., :3])
+    confusion_matrix.update(logits[..., 3:], target[..., 3:])
+    assert confusion_matrix.matrix.tolist() == [[1, 1, 0], [0, 2, 0], [1, 0, 1]]
+
+    metrics = confusion_matrix.compute()
+    assert metrics["iou"]["background"] == 1 / 3
+    assert metrics["precision"]["stroke"] == 2 / 3
+    assert metrics["recall"]["stroke"] == 1
+    assert metrics["recall"]["overlap"] == 0.5
+    assert metrics["dice"]["overlap"] == 2 / 3
+    assert metrics["summary"]["accuracy"] == 4 / 6
+
+    # the dice over the whole batch matches the vectorized scores for a single sample
+    dice, _ = multiclass_scores(logits, target)
+    for i, name in enumerate(["background", "stroke", "overlap"]):
+        assert math.isclose(metrics["dice"][name], dice[0, i].item(), rel_tol=1e-3)
+
+
+def test_missing_classes_are_nan():
+    confusion_matrix = ConfusionMatrix(3)
+    target = torch.zeros((1, 4, 4), dtype=torch.long)
+    confusion_matrix.update(torch.zeros((1, 3, 4, 4)), target)
+    metrics = confusion_matrix.compute()
+    assert metrics["iou"]["background"] == 1
+    assert math.isnan(metrics["iou"]["overlap"])
+    assert metrics["summary"]["mean_iou"] == 1
+
+
+def test_extra_classes_count_as_the_last_class():
+    # true classes 0 1 2 2, with overlaps predicted as strokes by a 1-class net
+    target = torch.tensor([[[0, 1, 2, 2]]])
+    logits = torch.tensor([[[[-1.0, 1.0, 1.0, -1.0]]]])
+    confusion_matrix = ConfusionMatrix(1)
+    confusion_matrix.update(logits, target)
+    assert confusion_matrix.matrix.tolist() == [[1, 0], [1, 2]]
+
+    confusion_matrix = ConfusionMatrix(2)
+    confusion_matrix.update(torch.zeros((1, 2, 1, 4)), target)
+    assert confusion_matrix.matrix.tolist() == [[1, 0], [3, 0]]
@@ -0,0 +1,48 @@
+import pytest
+import torch
+import torch.nn as nn
+from hanzi_font_deconstructor.model.unet.UNet import UNet
+from hanzi_font_deconstructor.model.unet.predict_net import (
+    get_max_tile_size,
+    get_tile_starts,
+    predict_logits,
+)
+
+
+def test_get_tile_starts_covers_everything():
+    assert get_tile_starts(64, 64, 16) == [0]
+    for size in [65, 100, 128, 500]:
+        starts = get_tile_starts(size, 64, 16)
+        assert starts[0] == 0
+        assert starts[-1] + 64 == size
+        # consecutive tiles overlap by at least the overlap
+        assert all(b - a <= 48 for a, b in zip(starts, starts[1:]))
+
+
+def test_get_max_tile_size():
+    tile_size = get_max_tile_size(256 * 1024 * 1024, batch_size=2)
+    assert tile_size % 16 == 0
+    assert tile_size > get_max_tile_size(256 * 1024 * 1024, batch_size=4)
+    with pytest.raises(Exception):
+        get_max_tile_size(1024)
+
+
+def test_tiled_logits_match_full_logits_for_pointwise_net():
+    # a net that only looks at single pixels has no seams, so blending tiles must give back the same logits
+    torch.manual_seed(0)
+    net = nn.Conv2d(1, 3, kernel_size=1)
+    imgs = torch.rand(2, 1, 100, 70)
+    with torch.inference_mode():
+        full = predict_logits(net, imgs)
+        tiled = predict_logits(net, imgs, tile_size=32, overlap=8)
+    assert torch.allclose(full, tiled, atol=1e-5)
+
+
+def test_tiled_and_downscaled_logits_have_full_size():
+    net = UNet(n_channels=1, n_classes=3, bilinear=True).eval()
+    imgs = torch.rand(1, 1, 96, 96)
+    with torch.inference_mode():
+        tiled = predict_logits(net, imgs, tile_size=64, overlap=16)
+        downscaled = predict_logits(net, imgs, scale=0.5)
+    assert tiled.shape == (1, 3, 96, 96)
+    assert downscaled.shape == (1, 3, 96, 96)
@@ -0,0 +1,51 @@
+import math
+import torch
+from hanzi_font_deconstructor.model.unet.telemetry import (
+    TelemetryLogger,
+    TelemetryPolicy,
+    get_parameter_stats,
+)
+
+
+class FakeWriter:
+    def __init__(self):
+        self.scalars = {}
+        self.histograms = []
+
+    def add_scalar(self, tag, value, step):
+        self.scalars[tag] = value
+
+    def add_histogram(self, tag, values, step):
+        self.histograms.append((tag, step))
+
+
+def make_net():
+    net = torch.nn.Sequential(torch.nn.Linear(3, 2))
+    net(torch.rand(4, 3)).sum().backward()
+    return net
+
+
+def test_get_parameter_stats():
+    net = make_net()
+    stats = get_parameter_stats(net)
+    weight = net[0].weight
+    assert math.isclose(
+        stats["weights/0/weight/norm"], torch.norm(weight).item(), rel_tol=1e-6
+    )
+    assert math.isclose(stats["weights/0/weight/min"], weight.min().item())
+    assert math.isclose(stats["weights/0/weight/max"], weight.max().item())
+    assert math.isclose(
+        stats["grads/0/bias/mean"], net[0].bias.grad.mean().item(), abs_tol=1e-6
+    )
+
+
+def test_histograms_are_only_logged_every_k_evals():
+    net = make_net()
+    writer = FakeWriter()
+    logger = TelemetryLogger(writer, TelemetryPolicy(histogram_every=2))
+    for step in range(3):
+        logger.log_parameters(net, step)
+    logger.close()
+    assert "grads/0/weight/norm" in writer.scalars
+    assert {step for _, step in writer.histograms} == {0, 2}
+    assert len(writer.histograms) == 8